@@ -1,8 +1,13 @@
 from flask import Flask, request, jsonify, render_template_string
 import json
 import difflib
+import hashlib
+import math
+import mmap
 import os
 import random
+import struct
+import unicodedata
 from datetime import datetime
 
 app = Flask(__name__)
@@ -69,6 +74,50 @@ def load_dictionary():
     print("No dictionary files found, creating minimal dictionary")
     return create_minimal_dictionary()
 
+# Corpus frequency table written by get_common.py. The api/ directory is deployed on
+# its own, so this reader mirrors frequency_table.FrequencyTable instead of importing it.
+FREQUENCY_HEADER = struct.Struct('<4sIII')  # magic, version, number of slots, largest count
+FREQUENCY_SLOT = struct.Struct('<QI')  # 64-bit word hash (0 = empty), count
+
+# How much corpus frequency can lift a fuzzy match: the most common word gains this much similarity
+FREQUENCY_BOOST = 0.1
+
+class FrequencyTable:
+    """Memory-mapped word frequency table with O(1) lookups."""
+    
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.slots, self.max_count = FREQUENCY_HEADER.unpack_from(self.data, 0)
+        if magic != b'YFRQ' or version != 1:
+            raise ValueError(f"{path} is not a version 1 frequency table")
+        self.mask = self.slots - 1
+    
+    def get(self, word, default=0):
+        word = unicodedata.normalize('NFC', word.lower().strip())
+        key = int.from_bytes(hashlib.blake2b(word.encode('utf-8'), digest_size=8).digest(), 'little') or 1
+        slot = key & self.mask
+        while True:
+            stored_key, count = FREQUENCY_SLOT.unpack_from(self.data, FREQUENCY_HEADER.size + slot * FREQUENCY_SLOT.size)
+            if stored_key == key:
+                return count
+            if stored_key == 0:
+                return default
+            slot = (slot + 1) & self.mask
+
+def load_frequencies():
+    """Load the corpus frequency table if one has been generated"""
+    for file_path in ['yoruba_frequencies.bin', os.path.join('api', 'yoruba_frequencies.bin'),
+                      os.path.join('..', 'yoruba_frequencies.bin')]:
+        if os.path.exists(file_path):
+            try:
+                frequencies = FrequencyTable(file_path)
+                print(f"Loaded word frequencies from {file_path}")
+                return frequencies
+            except (OSError, ValueError) as e:
+                print(f"Could not load {file_path}: {e}")
+    return None
+
 # Add random word generation for minimal dictionary extension
 def generate_yoruba_word():
     """Generate a new Yoruba word based on phonological patterns"""
@@ -117,6 +166,23 @@ if len(dictionary) < 50:
     
     print(f"Extended dictionary now has {len(dictionary)} entries")
 
+# Headwords from most to least common in the corpus, sorted once at startup
+frequencies = load_frequencies()
+if frequencies is not None:
+    ranked_headwords = sorted(dictionary.keys(), key=lambda headword: -frequencies.get(headword))
+else:
+    ranked_headwords = list(dictionary.keys())
+
+def rank_by_frequency(query, matches):
+    """Order fuzzy matches by spelling similarity, nudged up by how common each word is."""
+    scale = math.log1p(frequencies.max_count) or 1.0
+    
+    def score(match):
+        similarity = difflib.SequenceMatcher(None, query, match).ratio()
+        return similarity + FREQUENCY_BOOST * math.log1p(frequencies.get(match)) / scale
+    
+    return sorted(matches, key=score, reverse=True)
+
 def normalize_word(word):
     """Normalize a Yoruba word for matching: lowercase and strip whitespace."""
     return word.lower().strip()
@@ -137,28 +203,37 @@ def search_synonyms(query, max_results=3):
         })
         return results
     
-    # Check if query is in any of the synonyms (up to a limit to maintain performance)
+    # Check if query is in any of the synonyms (up to a limit to maintain performance),
+    # most common headwords first when frequencies are known
     synonym_check_limit = 1000
     synonym_checks = 0
     
-    for headword, entry in dictionary.items():
+    for headword in ranked_headwords:
         if synonym_checks >= synonym_check_limit:
             break
             
         synonym_checks += 1
+        entry = dictionary[headword]
         for synonym in entry["synonyms"]:
             if normalize_word(synonym) == query:
                 results.append({
-                    "rank": 1,
+                    "rank": len(results) + 1,
                     "similarity": 1.0,
                     "headword": entry["headword"],
                     "pos": entry["pos"],
                     "synonyms": entry["synonyms"]
                 })
-                return results  # Found exact match in synonyms
+                break
+        
+        # Without frequencies any match will do; with them, stop once enough of the most common are found
+        if results and (frequencies is None or len(results) >= max_results):
+            return results
+    
+    if results:
+        return results
     
     # Fuzzy match for large dictionaries
-    dict_keys = list(dictionary.keys())
+    dict_keys = ranked_headwords
     
     # Sampling keys for large dictionaries to improve performance
     if len(dict_keys) > 10000:
@@ -166,7 +241,12 @@ def search_synonyms(query, max_results=3):
     else:
         sampled_keys = dict_keys
     
-    matches = difflib.get_close_matches(query, sampled_keys, n=max_results, cutoff=0.6)
+    if frequencies is not None:
+        # Take extra candidates so common words just outside the top few can move up
+        matches = difflib.get_close_matches(query, sampled_keys, n=max_results * 3, cutoff=0.6)
+        matches = rank_by_frequency(query, matches)[:max_results]
+    else:
+        matches = difflib.get_close_matches(query, sampled_keys, n=max_results, cutoff=0.6)
     
     for i, match in enumerate(matches):
         # Calculate a similarity score (1.0 to 0.0)
@@ -587,14 +667,7 @@ HTML_TEMPLATE = '''
                     <div class="suggestions">
                         <p class="suggestions-title">Try one of these words instead:</p>
                         <div class="suggestion-grid">
-                            {% set random_words = namespace(words=[]) %}
-                            {% for word in dictionary.keys() %}
-                                {% if loop.index <= 8 %}
-                                    {% if random_words.words.append(word) %}{% endif %}
-                                {% endif %}
-                            {% endfor %}
-                            
-                            {% for word in random_words.words|sort %}
+                            {% for word in suggestions|sort %}
                                 <div class="suggestion-item" onclick="document.getElementById('query').value='{{ word }}'; document.getElementById('search-form').submit();">
                                     {{ word }}
                                 </div>
@@ -651,6 +724,7 @@ def index():
         query=query, 
         results=results, 
         dictionary_size=len(dictionary),
+        suggestions=ranked_headwords[:8],
         now=now
     )
 
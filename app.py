@@ -7,11 +7,13 @@ app.py - Streamlit web interface for the Yoruba synonym finder
 
 import streamlit as st
 import json
-import numpy as np
 import faiss
-from sentence_transformers import SentenceTransformer
 import os
 
+from query import (LazyModel, search_synonyms, search_by_meaning, load_field_indexes,
+                   load_neighbour_table, load_metadata, QueryEmbeddingCache)
+from hybrid_search import load_dictionary, build_synonym_index, hybrid_search
+
 # Set page configuration and title
 st.set_page_config(
     page_title="Yorùbá Synonym Finder",
@@ -21,8 +23,8 @@ st.set_page_config(
 
 # Cache the resource loading for better performance
 @st.cache_resource
-def load_resources(index_file="yoruba_index.faiss", texts_file="yoruba_texts.npy", 
-                  entries_file="yoruba_entries.npy", model_name=None):
+def load_resources(index_file="yoruba_index.faiss", texts_file="yoruba_texts.txt", 
+                  entries_file="yoruba_entries.jsonl", model_name=None, quantize=False):
     """
     Load the FAISS index, headwords, entries, and initialize the model.
     """
@@ -45,41 +47,50 @@ def load_resources(index_file="yoruba_index.faiss", texts_file="yoruba_texts.npy
     index = faiss.read_index(index_file)
     
     # Load the headwords
-    headwords = np.load(texts_file, allow_pickle=True)
+    headwords = load_metadata(texts_file)
     
     # Load the entries
-    entries = np.load(entries_file, allow_pickle=True)
+    entries = load_metadata(entries_file)
     
-    # Load the model
-    model = SentenceTransformer(model_name)
+    # The model is only loaded when a query actually needs embeddings
+    model = LazyModel(model_name, quantize=quantize)
     
     return index, headwords, entries, model
 
-def search_synonyms(query, index, headwords, entries, model, top_k=3):
+@st.cache_resource
+def get_query_cache(quantize=False, max_size=10000):
     """
-    Search for synonyms of the given query word.
+    Query embedding cache shared by every session of the app, one per encoder.
     """
-    # Encode the query
-    query_embedding = model.encode([query], convert_to_numpy=True)
-    
-    # Normalize the query embedding for cosine similarity
-    faiss.normalize_L2(query_embedding)
-    
-    # Search the index
-    distances, indices = index.search(query_embedding, top_k)
-    
-    results = []
-    for i, idx in enumerate(indices[0]):
-        if idx < len(entries):
-            entry = entries[idx]
-            similarity = distances[0][i]
-            results.append({
-                "rank": i + 1,
-                "similarity": float(similarity),
-                "entry": entry
-            })
+    return QueryEmbeddingCache(max_size)
+
+@st.cache_resource
+def get_field_indexes():
+    """
+    Definition and example indexes built with build_index.py --fields, if any.
+    """
+    return load_field_indexes()
+
+@st.cache_resource
+def get_neighbour_table(_headwords):
+    """
+    Precomputed headword neighbours from build_index.py --knn-k, if any.
+    """
+    return load_neighbour_table(_headwords)
+
+@st.cache_resource
+def load_lexical_resources(dict_files=("yoruba_synonyms_massive.json",
+                                       "yoruba_synonyms_expanded.json",
+                                       "yoruba_synonyms_static.json")):
+    """
+    Load the first available dictionary and its synonym index for hybrid search.
+    """
+    for dict_file in dict_files:
+        if os.path.exists(dict_file):
+            dictionary = load_dictionary(dict_file)
+            return dictionary, build_synonym_index(dictionary)
     
-    return results
+    return None, None
 
 # App title and header
 st.title("Yorùbá Synonym Finder")
@@ -88,8 +99,21 @@ This application helps you find synonyms for Yoruba words.
 Enter a Yoruba word in the search box below and click the search button.
 """)
 
+# Encoder settings
+quantize = st.sidebar.checkbox(
+    "Use int8 quantized encoder",
+    value=False,
+    help="Faster CPU query encoding at a small cost in recall. Run `python query.py --compare-quantized` to measure it."
+)
+
+search_mode = st.sidebar.radio(
+    "Search mode",
+    ["Semantic", "Hybrid"],
+    help="Hybrid answers exact and synonym matches from the dictionary and only runs fuzzy + semantic search on a miss."
+)
+
 # Check if resources exist or give setup instructions
-index, headwords, entries, model = load_resources()
+index, headwords, entries, model = load_resources(quantize=quantize)
 
 if index is None:
     st.error("Required resources not found. Please run the setup scripts first:")
@@ -105,6 +129,30 @@ if index is None:
     """)
     st.stop()
 
+query_cache = get_query_cache(quantize)
+
+dictionary, synonym_index = None, None
+if search_mode == "Hybrid":
+    dictionary, synonym_index = load_lexical_resources()
+    if dictionary is None:
+        st.sidebar.warning("No dictionary file found, falling back to semantic search.")
+
+neighbours = get_neighbour_table(headwords)
+field_indexes = get_field_indexes()
+by_meaning = False
+if field_indexes:
+    by_meaning = st.sidebar.checkbox(
+        "Search by meaning",
+        value=False,
+        help=f"Also match English or Yoruba text against: {', '.join(field_indexes)}"
+    )
+
+def semantic_search(query, top_k=3):
+    if by_meaning:
+        return search_by_meaning(query, index, field_indexes, entries, model, top_k=top_k, cache=query_cache)
+    return search_synonyms(query, index, headwords, entries, model, top_k=top_k, cache=query_cache,
+                           neighbours=neighbours)
+
 # Search interface
 col1, col2 = st.columns([3, 1])
 
@@ -117,7 +165,10 @@ with col2:
 # Display loading spinner during search
 if search_button and query:
     with st.spinner("Searching..."):
-        results = search_synonyms(query.strip(), index, headwords, entries, model)
+        if dictionary is not None:
+            results = hybrid_search(query.strip(), dictionary, synonym_index, semantic_search)
+        else:
+            results = semantic_search(query.strip())
     
     # Display results
     if not results:
@@ -134,6 +185,8 @@ if search_button and query:
                 with col1:
                     st.markdown(f"### Rank {result['rank']}")
                     st.markdown(f"Similarity: {similarity:.4f}")
+                    if result.get("field"):
+                        st.caption(f"Matched on {result['field']}")
                 
                 with col2:
                     st.markdown(f"### {entry['headword']} ({entry['pos']})")
@@ -144,6 +197,13 @@ if search_button and query:
                 
                 st.markdown("---")
 
+# Encoder status
+st.sidebar.caption(f"Encoder: {'loaded' if model.loaded else 'not loaded yet'}")
+
+# Query cache statistics
+st.sidebar.metric("Query cache hit rate", f"{query_cache.hit_rate:.1%}")
+st.sidebar.caption(f"{query_cache.hits} hits, {query_cache.misses} misses, {len(query_cache)} cached queries")
+
 # Footer
 st.markdown("---")
 st.markdown("© 2023 Yorùbá Synonym Finder - Built with Streamlit, FAISS, and Sentence Transformers") 
\ No newline at end of file
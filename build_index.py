@@ -5,107 +5,587 @@
 build_index.py - Build a FAISS index for fast semantic search of Yoruba words
 """
 
+import os
 import json
+import time
+import multiprocessing as mp
+from multiprocessing import shared_memory
 import numpy as np
 import faiss
 from sentence_transformers import SentenceTransformer
 from tqdm import tqdm
 import argparse
 
-def load_entries(file_path):
+def _iter_json_entries(f):
     """
-    Load the Yoruba entries from the JSONL file.
+    Yield the entries of a JSON dictionary file, either a headword -> entry object
+    or a list of entries. Streams with ijson when it is installed.
     """
-    entries = []
-    headwords = []
+    first = f.read(1)
+    while first and first.isspace():
+        first = f.read(1)
+    f.seek(0)
     
     try:
+        import ijson
+    except ImportError:
+        ijson = None
+        print("ijson is not installed; loading the whole JSON file into memory. "
+              "Install ijson or use JSONL input to stream large dictionaries.")
+    
+    if first == b'{':
+        items = ijson.kvitems(f, '') if ijson else json.load(f).items()
+        for headword, entry in items:
+            entry.setdefault("headword", headword)
+            yield entry
+    else:
+        yield from (ijson.items(f, 'item') if ijson else json.load(f))
+
+def iter_entries(file_path):
+    """
+    Stream Yoruba entries from a JSONL file (generate_entries.py output) or a JSON
+    dictionary file (yoruba_synonyms_expanded.json, yoruba_synonyms_massive.json, ...).
+    """
+    try:
+        # ijson wants bytes; the JSONL path decodes line by line
+        if file_path.endswith('.json'):
+            with open(file_path, 'rb') as f:
+                yield from _iter_json_entries(f)
+            return
+        
         with open(file_path, 'r', encoding='utf-8') as f:
             for line in f:
                 line = line.strip()
                 if not line:
                     continue
                 
-                entry = json.loads(line)
-                entries.append(entry)
-                headwords.append(entry["headword"])
-                
-        return entries, headwords
+                yield json.loads(line)
     except FileNotFoundError:
         raise FileNotFoundError(f"File {file_path} not found. Run generate_entries.py first.")
     except json.JSONDecodeError:
         raise ValueError(f"File {file_path} contains invalid JSON.")
 
-def build_faiss_index(headwords, model_name):
+def iter_chunks(iterable, size):
     """
-    Build a FAISS index for the Yoruba headwords using sentence transformers.
+    Group an iterable into lists of at most size items.
+    """
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    
+    if chunk:
+        yield chunk
+
+class MetadataWriter:
+    """
+    Append headwords (one per line) and full entries (JSONL) as they are indexed,
+    so row i of both files matches vector i of the index.
+    
+    With atomic=True the rows go to .tmp files that only replace the real files on
+    commit(), so a failed build leaves the previous metadata next to the previous index.
+    """
+    
+    def __init__(self, headwords_file, entries_file, atomic=False):
+        for path in (headwords_file, entries_file):
+            if path.endswith('.npy'):
+                raise ValueError(f"{path}: metadata is written incrementally, use a .txt or .jsonl file instead.")
+        
+        self.paths = (headwords_file, entries_file)
+        suffix = '.tmp' if atomic else ''
+        self.headwords = open(headwords_file + suffix, 'w', encoding='utf-8')
+        self.entries = open(entries_file + suffix, 'w', encoding='utf-8')
+        self.pending = atomic
+        self.count = 0
+    
+    def write(self, entries):
+        for entry in entries:
+            self.headwords.write(entry["headword"].replace('\n', ' ') + '\n')
+            self.entries.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self.count += len(entries)
+    
+    def flush(self):
+        self.headwords.flush()
+        self.entries.flush()
+    
+    def close(self):
+        self.headwords.close()
+        self.entries.close()
+    
+    def commit(self):
+        """
+        Move atomically written files into place; a no-op when writing in place or
+        already committed. Files still open keep appending to the moved files.
+        """
+        if not self.headwords.closed:
+            self.flush()
+        if self.pending:
+            for f, path in zip((self.headwords, self.entries), self.paths):
+                os.replace(f.name, path)
+            self.pending = False
+    
+    def discard(self):
+        """
+        Delete atomically written files that were never committed.
+        """
+        self.close()
+        if self.pending:
+            for f in (self.headwords, self.entries):
+                if os.path.exists(f.name):
+                    os.remove(f.name)
+            self.pending = False
+
+def _init_encode_worker(model_name):
+    """
+    Load the sentence transformer once per worker process.
+    """
+    global _worker_model
+    
+    # Each worker gets its own share of the cores instead of fighting over all of them
+    import torch
+    torch.set_num_threads(1)
+    
+    _worker_model = SentenceTransformer(model_name, device='cpu')
+
+def _encode_shard(task):
+    """
+    Encode one shard of texts and write the vectors into the shared output array.
+    """
+    shm_name, shape, start, texts, batch_size = task
+    
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        output = np.ndarray(shape, dtype='float32', buffer=shm.buf)
+        for i in range(0, len(texts), batch_size):
+            batch = texts[i:i+batch_size]
+            output[start+i:start+i+len(batch)] = _worker_model.encode(
+                batch, batch_size=batch_size, convert_to_numpy=True
+            )
+        del output
+    finally:
+        shm.close()
+    
+    return len(texts)
+
+class Encoder:
+    """
+    Encode texts with a sentence transformer, optionally sharded across a pool of
+    worker processes that write straight into a shared float32 array.
+    """
+    
+    def __init__(self, model_name, batch_size=32, workers=1):
+        print(f"Loading model: {model_name}")
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name)
+        self.dimension = self.model.get_sentence_embedding_dimension()
+        self.batch_size = batch_size
+        self.workers = workers
+        self.pool = None
+        self.total_texts = 0
+        self.total_seconds = 0.0
+        
+        if workers > 1:
+            print(f"Starting {workers} encoder processes...")
+            # Spawn rather than fork so the workers don't inherit torch's thread state
+            context = mp.get_context('spawn')
+            self.pool = context.Pool(workers, initializer=_init_encode_worker, initargs=(model_name,))
+    
+    def encode(self, texts, progress=True):
+        """
+        Encode a list of texts into an L2-normalized float32 matrix.
+        """
+        start_time = time.time()
+        
+        if self.pool is None:
+            embeddings = np.empty((len(texts), self.dimension), dtype='float32')
+            for i in tqdm(range(0, len(texts), self.batch_size), disable=not progress):
+                batch = texts[i:i+self.batch_size]
+                embeddings[i:i+len(batch)] = self.model.encode(
+                    batch, batch_size=self.batch_size, convert_to_numpy=True
+                )
+        else:
+            embeddings = self._encode_parallel(texts, progress)
+        
+        # Normalize vectors for cosine similarity
+        faiss.normalize_L2(embeddings)
+        
+        self.total_texts += len(texts)
+        self.total_seconds += time.time() - start_time
+        if progress:
+            self.report_throughput()
+        
+        return embeddings
+    
+    def report_throughput(self):
+        """
+        Print how many texts have been encoded so far and how fast.
+        """
+        rate = self.total_texts / self.total_seconds if self.total_seconds > 0 else 0
+        print(f"Encoded {self.total_texts} texts in {self.total_seconds:.2f} seconds ({rate:.1f} texts/sec)")
+    
+    def _encode_parallel(self, texts, progress=True):
+        """
+        Shard the texts across the worker pool and collect the shared output array.
+        """
+        shape = (len(texts), self.dimension)
+        nbytes = max(1, len(texts) * self.dimension * 4)
+        shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        try:
+            # Several shards per worker so a slow worker doesn't hold up the rest
+            shard_size = max(self.batch_size, -(-len(texts) // (self.workers * 4)))
+            tasks = [
+                (shm.name, shape, start, texts[start:start+shard_size], self.batch_size)
+                for start in range(0, len(texts), shard_size)
+            ]
+            
+            with tqdm(total=len(texts), disable=not progress) as pbar:
+                for done in self.pool.imap_unordered(_encode_shard, tasks):
+                    pbar.update(done)
+            
+            output = np.ndarray(shape, dtype='float32', buffer=shm.buf)
+            embeddings = output.copy()
+            del output
+        finally:
+            shm.close()
+            shm.unlink()
+        
+        return embeddings
+    
+    def close(self):
+        """
+        Shut down the worker pool, if any.
+        """
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+INDEX_TYPES = ['flat', 'fp16', 'int8', 'pq']
+
+# Entry fields that can get their own index, with the slug used in the index file name
+FIELD_SLUGS = {
+    'definition': 'definition',
+    'example.en': 'example_en',
+    'example.yorùbá': 'example_yo'
+}
+
+def get_field_text(entry, field):
+    """
+    Look up a dotted field such as 'example.en' in an entry, returning '' if missing.
+    """
+    value = entry
+    for key in field.split('.'):
+        if not isinstance(value, dict):
+            return ""
+        value = value.get(key, "")
+    return value if isinstance(value, str) else ""
+
+def field_index_path(index_file, field):
+    """
+    Path of the index for an extra field, e.g. yoruba_index.definition.faiss.
+    """
+    root, ext = os.path.splitext(index_file)
+    return f"{root}.{FIELD_SLUGS[field]}{ext}"
+
+def create_index(dimension, index_type='flat', pq_m=48, pq_bits=8):
     """
-    print(f"Loading model: {model_name}")
-    model = SentenceTransformer(model_name)
+    Create an empty inner-product FAISS index with the requested vector storage.
+    """
+    if index_type == 'flat':
+        # Exact search over full float32 vectors
+        return faiss.IndexFlatIP(dimension)
+    if index_type == 'fp16':
+        return faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT)
+    if index_type == 'int8':
+        return faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+    if index_type == 'pq':
+        if dimension % pq_m != 0:
+            raise ValueError(f"--pq-m {pq_m} must divide the embedding dimension {dimension}.")
+        return faiss.IndexPQ(dimension, pq_m, pq_bits, faiss.METRIC_INNER_PRODUCT)
+    raise ValueError(f"Unknown index type: {index_type}")
+
+def train_index(index, embeddings):
+    """
+    Train the index on the embeddings if its storage needs training (int8 ranges, PQ codebooks).
+    """
+    if index.is_trained:
+        return
+    
+    if isinstance(index, faiss.IndexPQ) and len(embeddings) < 2 ** index.pq.nbits:
+        raise ValueError(
+            f"PQ with {index.pq.nbits} bits needs at least {2 ** index.pq.nbits} vectors to train, "
+            f"got {len(embeddings)}. Lower --pq-bits or use another --index-type."
+        )
+    
+    print(f"Training index on {len(embeddings)} vectors...")
+    index.train(embeddings)
+
+class ExactTopK:
+    """
+    Exact top-k inner-product neighbours for a fixed set of query vectors, updated
+    chunk by chunk so the full vector set never has to be in memory at once.
+    """
+    
+    def __init__(self, queries, k):
+        self.queries = queries
+        self.k = k
+        self.scores = np.empty((len(queries), 0), dtype='float32')
+        self.ids = np.empty((len(queries), 0), dtype='int64')
+        self.offset = 0
+    
+    def add(self, chunk):
+        scores = self.queries @ chunk.T
+        ids = np.broadcast_to(np.arange(self.offset, self.offset + len(chunk)), scores.shape)
+        self.offset += len(chunk)
+        
+        scores = np.hstack([self.scores, scores])
+        ids = np.hstack([self.ids, ids])
+        if scores.shape[1] > self.k:
+            top = np.argpartition(-scores, self.k - 1, axis=1)[:, :self.k]
+            scores = np.take_along_axis(scores, top, axis=1)
+            ids = np.take_along_axis(ids, top, axis=1)
+        self.scores, self.ids = scores, ids
+
+def measure_recall(index, queries, exact_ids):
+    """
+    Fraction of the exact top-k neighbours that the index returns for the queries.
+    """
+    k = exact_ids.shape[1]
+    _, ids = index.search(queries, k)
+    overlap = [len(set(a) & set(b)) for a, b in zip(ids.tolist(), exact_ids.tolist())]
+    return sum(overlap) / (len(queries) * k) if len(queries) and k else 1.0
+
+def report_index(index, index_file, exact=None):
+    """
+    Print the index size on disk and in RAM, and its recall against exact search.
+    """
+    disk_bytes = os.path.getsize(index_file)
+    ram_bytes = faiss.serialize_index(index).nbytes
+    flat_bytes = index.ntotal * index.d * 4
     
-    print("Encoding headwords...")
-    embeddings = []
+    print(f"Index size on disk: {disk_bytes / (1024 * 1024):.2f} MB")
+    print(f"Index size in RAM: {ram_bytes / (1024 * 1024):.2f} MB "
+          f"({ram_bytes / flat_bytes if flat_bytes else 0:.1%} of flat float32)")
     
-    # Process in batches to show progress
-    batch_size = 32
-    for i in tqdm(range(0, len(headwords), batch_size)):
-        batch = headwords[i:i+batch_size]
-        batch_embeddings = model.encode(batch, convert_to_numpy=True)
-        embeddings.extend(batch_embeddings)
+    if isinstance(index, faiss.IndexFlat) or exact is None or index.ntotal == 0:
+        return
     
-    # Convert to numpy array
-    embeddings = np.array(embeddings).astype('float32')
+    print(f"Recall@{exact.ids.shape[1]} against exact search ({len(exact.queries)} sample queries): "
+          f"{measure_recall(index, exact.queries, exact.ids):.4f}")
+
+class IndexBuilder:
+    """
+    Add vectors to an index as they arrive. Index types that need training buffer
+    their first train_size vectors, train on them, then add incrementally.
+    """
     
-    # Normalize vectors for cosine similarity
-    faiss.normalize_L2(embeddings)
+    def __init__(self, dimension, index_type='flat', pq_m=48, pq_bits=8, train_size=50000):
+        self.index = create_index(dimension, index_type, pq_m, pq_bits)
+        self.train_size = train_size
+        self.pending = []
+        self.pending_count = 0
     
-    # Create the index - using IndexFlatIP for inner product (cosine similarity with normalized vectors)
-    print("Building FAISS index...")
-    index = faiss.IndexFlatIP(embeddings.shape[1])
-    index.add(embeddings)
+    def add(self, embeddings):
+        if self.index.is_trained:
+            self.index.add(embeddings)
+            return
+        
+        self.pending.append(embeddings)
+        self.pending_count += len(embeddings)
+        if self.pending_count >= self.train_size:
+            self.finish()
     
-    return index, embeddings, model
+    def finish(self):
+        """
+        Train on and add any buffered vectors.
+        """
+        if not self.pending:
+            return
+        
+        embeddings = np.vstack(self.pending)
+        self.pending = []
+        self.pending_count = 0
+        train_index(self.index, embeddings)
+        self.index.add(embeddings)
+
+def build_knn_table(index, k=10, batch_size=4096):
+    """
+    Precompute the top-k neighbours of every indexed vector by searching the
+    index with its own vectors, batch by batch.
+    Returns int32 neighbour IDs and float16 scores, one row per vector.
+    """
+    total = index.ntotal
+    k = min(k, total)
+    ids = np.empty((total, k), dtype='int32')
+    scores = np.empty((total, k), dtype='float16')
+    
+    start_time = time.time()
+    for start in tqdm(range(0, total, batch_size)):
+        count = min(batch_size, total - start)
+        vectors = index.reconstruct_n(start, count)
+        batch_scores, batch_ids = index.search(vectors, k)
+        ids[start:start+count] = batch_ids
+        scores[start:start+count] = batch_scores
+    
+    elapsed = time.time() - start_time
+    rate = total / elapsed if elapsed > 0 else 0
+    print(f"Computed {k} neighbours for {total} vectors in {elapsed:.2f} seconds ({rate:.1f} vectors/sec)")
+    
+    return ids, scores
+
+def encode_chunk(encoder, chunk, fields=()):
+    """
+    Encode the headwords and extra fields of a chunk of entries in one pass.
+    Returns len(chunk) rows per field, headwords first, in the order of fields.
+    """
+    texts = [entry["headword"] for entry in chunk]
+    for field in fields:
+        # Entries with an empty field still get a vector so IDs line up across indexes
+        texts.extend(get_field_text(entry, field) for entry in chunk)
+    
+    # Encode every field in one pass so the encoder batches stay full
+    embeddings = encoder.encode(texts, progress=False)
+    
+    # Empty fields get a zero vector so they never score above a real match
+    embeddings[np.array([not text for text in texts], dtype=bool)] = 0
+    
+    return embeddings
+
+def build_faiss_index(entries, model_name, metadata, fields=(), batch_size=32, workers=1,
+                      index_type='flat', pq_m=48, pq_bits=8, chunk_size=10000, train_size=50000,
+                      recall_k=10, recall_sample=1000):
+    """
+    Build a FAISS index for the Yoruba headwords using sentence transformers.
+    
+    Entries are streamed in chunks: each chunk's headwords and extra fields are
+    encoded in one pass, added to the indexes and written to the metadata files,
+    so memory use does not grow with the size of the dictionary.
+    """
+    encoder = Encoder(model_name, batch_size=batch_size, workers=workers)
+    builders = {
+        field: IndexBuilder(encoder.dimension, index_type, pq_m, pq_bits, train_size)
+        for field in ('headword',) + tuple(fields)
+    }
+    exact = None
+    
+    print(f"Encoding and indexing headwords{' and ' + ', '.join(fields) if fields else ''} ({index_type})...")
+    try:
+        with tqdm(unit=" entries") as pbar:
+            for chunk in iter_chunks(entries, chunk_size):
+                embeddings = encode_chunk(encoder, chunk, fields)
+                
+                if index_type != 'flat':
+                    # Recall is measured for the first headwords, searched exactly over all of them
+                    headword_embeddings = embeddings[:len(chunk)]
+                    if exact is None:
+                        exact = ExactTopK(headword_embeddings[:recall_sample].copy(), recall_k)
+                    exact.add(headword_embeddings)
+                
+                for i, builder in enumerate(builders.values()):
+                    builder.add(embeddings[i * len(chunk):(i + 1) * len(chunk)])
+                
+                metadata.write(chunk)
+                pbar.update(len(chunk))
+    finally:
+        encoder.close()
+    
+    encoder.report_throughput()
+    
+    for builder in builders.values():
+        builder.finish()
+    
+    index = builders.pop('headword').index
+    field_indexes = {field: builder.index for field, builder in builders.items()}
+    
+    return index, field_indexes, exact
 
 def main():
     parser = argparse.ArgumentParser(description='Build a FAISS index for Yoruba words')
     parser.add_argument('--input', type=str, default='yoruba_synonyms.jsonl',
-                        help='Input JSONL file with synonym entries')
+                        help='Input dictionary: JSONL entries or a JSON headword -> entry file')
     parser.add_argument('--index-output', type=str, default='yoruba_index.faiss',
                         help='Output FAISS index file')
-    parser.add_argument('--headwords-output', type=str, default='yoruba_texts.npy',
-                        help='Output NumPy file for headwords')
-    parser.add_argument('--entries-output', type=str, default='yoruba_entries.npy',
-                        help='Output NumPy file for full entries')
+    parser.add_argument('--headwords-output', type=str, default='yoruba_texts.txt',
+                        help='Output text file for headwords, one per line')
+    parser.add_argument('--entries-output', type=str, default='yoruba_entries.jsonl',
+                        help='Output JSONL file for full entries')
     parser.add_argument('--model', type=str, default='all-MiniLM-L6-v2',
                         help='Sentence transformer model to use')
+    parser.add_argument('--batch-size', type=int, default=32,
+                        help='Number of texts per encoder batch')
+    parser.add_argument('--chunk-size', type=int, default=10000,
+                        help='Number of entries read, encoded and indexed at a time')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of encoder processes (1 encodes in this process)')
+    parser.add_argument('--index-type', type=str, default='flat', choices=INDEX_TYPES,
+                        help='Vector storage: exact float32, float16 or int8 scalar quantization, or product quantization')
+    parser.add_argument('--pq-m', type=int, default=48,
+                        help='Number of PQ sub-quantizers (must divide the embedding dimension)')
+    parser.add_argument('--pq-bits', type=int, default=8,
+                        help='Bits per PQ sub-quantizer code')
+    parser.add_argument('--train-size', type=int, default=50000,
+                        help='Vectors buffered to train int8 and PQ indexes before adding incrementally')
+    parser.add_argument('--fields', type=str, default='',
+                        help=f"Comma-separated entry fields to index alongside the headword ({', '.join(FIELD_SLUGS)})")
+    parser.add_argument('--knn-k', type=int, default=10,
+                        help='Neighbours to precompute per headword for table lookups (0 to skip)')
+    parser.add_argument('--knn-output', type=str, default='yoruba_knn.npz',
+                        help='Output NumPy file for the precomputed neighbour table')
     
     args = parser.parse_args()
     
-    print(f"Loading entries from {args.input}...")
-    entries, headwords = load_entries(args.input)
-    print(f"Loaded {len(headwords)} entries")
+    fields = [field.strip() for field in args.fields.split(',') if field.strip()]
+    for field in fields:
+        if field not in FIELD_SLUGS:
+            raise ValueError(f"Unknown field {field}. Choose from: {', '.join(FIELD_SLUGS)}")
     
-    # Build the index
-    index, embeddings, model = build_faiss_index(headwords, args.model)
+    # Headwords and entries are written as they are indexed, and only replace the
+    # existing files once the new index has been saved
+    print(f"Streaming entries from {args.input}...")
+    print(f"Writing headwords to {args.headwords_output} and entries to {args.entries_output}...")
+    metadata = MetadataWriter(args.headwords_output, args.entries_output, atomic=True)
+    try:
+        index, field_indexes, exact = build_faiss_index(
+            iter_entries(args.input), args.model, metadata, fields=fields,
+            batch_size=args.batch_size, workers=args.workers, index_type=args.index_type,
+            pq_m=args.pq_m, pq_bits=args.pq_bits, chunk_size=args.chunk_size,
+            train_size=args.train_size
+        )
+    except BaseException:
+        metadata.discard()
+        raise
+    finally:
+        metadata.close()
+    print(f"Indexed {metadata.count} entries")
     
     # Save the index
     print(f"Saving index to {args.index_output}...")
     faiss.write_index(index, args.index_output)
+    report_index(index, args.index_output, exact)
     
-    # Save the headwords and entries
-    print(f"Saving headwords to {args.headwords_output}...")
-    np.save(args.headwords_output, np.array(headwords, dtype=object))
+    field_files = {}
+    for field, field_index in field_indexes.items():
+        field_files[field] = field_index_path(args.index_output, field)
+        print(f"Saving {field} index to {field_files[field]}...")
+        faiss.write_index(field_index, field_files[field])
+    metadata.commit()
     
-    # Save the complete entries for later retrieval
-    print(f"Saving complete entries to {args.entries_output}...")
-    np.save(args.entries_output, np.array(entries, dtype=object))
+    knn_file = None
+    if args.knn_k > 0 and index.ntotal > 0:
+        print(f"Precomputing {args.knn_k} nearest neighbours per headword...")
+        knn_ids, knn_scores = build_knn_table(index, args.knn_k)
+        knn_file = args.knn_output
+        print(f"Saving neighbour table to {knn_file}...")
+        np.savez(knn_file, ids=knn_ids, scores=knn_scores)
     
     # Save model information
-    model_info = {"name": args.model}
+    model_info = {"name": args.model, "fields": field_files, "knn": knn_file}
     with open("model_info.json", "w") as f:
         json.dump(model_info, f)
     
     print("Index building complete! You can now query the index using query.py.")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
\ No newline at end of file
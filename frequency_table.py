@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+frequency_table.py - Compact on-disk word frequency table with O(1) lookups
+"""
+
+import os
+import mmap
+import struct
+import hashlib
+import unicodedata
+
+# File layout: a header, then an open-addressing hash table of fixed-size slots.
+# Each slot holds a 64-bit word hash (0 = empty) and a 32-bit count, so the file
+# can be memory-mapped and probed directly without loading or parsing it.
+MAGIC = b'YFRQ'
+HEADER = struct.Struct('<4sIII')  # magic, version, number of slots, largest count
+SLOT = struct.Struct('<QI')
+VERSION = 1
+MAX_COUNT = 2 ** 32 - 1
+
+def word_key(word):
+    """
+    64-bit hash of a normalized word; never 0, which marks an empty slot.
+    """
+    word = unicodedata.normalize('NFC', word.lower().strip())
+    key = int.from_bytes(hashlib.blake2b(word.encode('utf-8'), digest_size=8).digest(), 'little')
+    return key or 1
+
+def write_frequency_table(counts, path):
+    """
+    Write a word -> count mapping as a frequency table file, at most half full
+    so probe sequences stay short.
+    """
+    slots = 8
+    while slots < 2 * len(counts):
+        slots *= 2
+    mask = slots - 1
+    
+    table = bytearray(HEADER.size + slots * SLOT.size)
+    max_count = 0
+    for word, count in counts.items():
+        key = word_key(word)
+        count = min(int(count), MAX_COUNT)
+        max_count = max(max_count, count)
+        
+        # Linear probing; words whose normalized forms collide share one slot
+        slot = key & mask
+        while True:
+            offset = HEADER.size + slot * SLOT.size
+            stored_key, stored_count = SLOT.unpack_from(table, offset)
+            if stored_key == 0 or stored_key == key:
+                SLOT.pack_into(table, offset, key, min(stored_count + count, MAX_COUNT))
+                break
+            slot = (slot + 1) & mask
+    
+    HEADER.pack_into(table, 0, MAGIC, VERSION, slots, max_count)
+    
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(table)
+    os.replace(tmp_path, path)
+
+class FrequencyTable:
+    """
+    Read-only, memory-mapped view of a frequency table file.
+    """
+    
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.slots, self.max_count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} frequency table.")
+        self.mask = self.slots - 1
+    
+    def get(self, word, default=0):
+        """
+        Corpus count of a word, or default if it never occurred.
+        """
+        key = word_key(word)
+        slot = key & self.mask
+        while True:
+            stored_key, count = SLOT.unpack_from(self.data, HEADER.size + slot * SLOT.size)
+            if stored_key == key:
+                return count
+            if stored_key == 0:
+                return default
+            slot = (slot + 1) & self.mask
+    
+    def close(self):
+        self.data.close()
+
+def load_frequency_table(paths):
+    """
+    Open the first frequency table that exists in paths, or return None.
+    """
+    for path in paths:
+        if os.path.exists(path):
+            try:
+                return FrequencyTable(path)
+            except (OSError, ValueError) as e:
+                print(f"Could not load {path}: {e}")
+    return None
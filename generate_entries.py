@@ -6,25 +6,36 @@ generate_entries.py - Generate synonyms for Yoruba headwords using a local trans
 """
 
 import os
+import glob
 import json
+import multiprocessing as mp
 import torch
 from tqdm import tqdm
 import time
 import argparse
 import re
+import unicodedata
+from collections import Counter
 from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
 
 # Define the device - GPU if available, otherwise CPU
 DEVICE = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
 
-def load_model_and_tokenizer(model_name):
+def load_model_and_tokenizer(model_name, quantize=False):
     """
-    Load the transformer model and tokenizer.
+    Load the transformer model and tokenizer, optionally with int8 linear layers on CPU.
     """
     print(f"Loading model {model_name}...")
     tokenizer = AutoTokenizer.from_pretrained(model_name)
     model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
-    model.to(DEVICE)
+    
+    if quantize:
+        # Dynamic quantization only runs on CPU
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    else:
+        model.to(DEVICE)
+    
+    model.eval()
     return model, tokenizer
 
 def load_common_words(filename):
@@ -39,12 +50,52 @@ def load_common_words(filename):
     except json.JSONDecodeError:
         raise ValueError(f"File {filename} contains invalid JSON.")
 
-def create_prompt(word):
+def headword_key(word):
     """
-    Create a few-shot prompt for the model to generate synonyms.
+    Key for comparing headwords: NFC-normalized, so precomposed and combining
+    tone marks compare equal.
+    """
+    return unicodedata.normalize('NFC', word.strip())
+
+def dedupe_words(words):
+    """
+    Drop repeated words, keeping the first occurrence of each.
+    """
+    unique = {}
+    for word in words:
+        if word.strip():
+            unique.setdefault(headword_key(word), word.strip())
+    return list(unique.values())
+
+def load_completed_words(output_file):
+    """
+    Return the headword_key of every entry already written to output_file by an earlier run.
+    A trailing partial line left by a crash is truncated so appending is safe.
     """
-    # Few-shot examples
-    prompt = """Generate 5 Yoruba synonyms, part of speech, definition, and example sentence for the word in English and Yoruba.
+    completed = set()
+    if not os.path.exists(output_file):
+        return completed
+    
+    with open(output_file, 'rb+') as f:
+        good_offset = 0
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                break
+            completed.add(headword_key(entry["headword"]))
+            good_offset += len(line)
+        
+        if good_offset < os.path.getsize(output_file):
+            print(f"Truncating incomplete record at the end of {output_file}")
+            f.truncate(good_offset)
+    
+    return completed
+
+# Few-shot examples shared by every prompt
+FEW_SHOT_PREFIX = """Generate 5 Yoruba synonyms, part of speech, definition, and example sentence for the word in English and Yoruba.
 
 Word: ilé
 Part of speech: noun
@@ -67,10 +118,55 @@ Definition: Good, fine, or beautiful.
 Example in Yoruba: Aṣọ yìí dára púpọ̀.
 Example in English: This cloth is very good.
 
-Word: {}
-Part of speech:"""
+"""
+
+# Instructions without the worked examples, for the compact prompt style
+COMPACT_PREFIX = """Give the part of speech, 5 Yoruba synonyms, an English definition, and example sentences in Yoruba and English for the Yoruba word. Use the labels Part of speech, Synonyms, Definition, Example in Yoruba, Example in English.
+
+"""
+
+PROMPT_STYLES = ['few-shot', 'compact', 'packed']
+
+def prompt_tail(word):
+    """
+    The word-specific end of every prompt; the model continues from here.
+    """
+    return f"Word: {word}\nPart of speech:"
+
+def create_prompt(word):
+    """
+    Create a few-shot prompt for the model to generate synonyms.
+    """
+    return FEW_SHOT_PREFIX + prompt_tail(word)
+
+def create_compact_prompt(word):
+    """
+    Create a short instruction-only prompt, a fraction of the few-shot prompt's length.
+    """
+    return COMPACT_PREFIX + prompt_tail(word)
+
+def create_packed_prompt(words):
+    """
+    Create one few-shot prompt asking for several words, so the examples are
+    encoded once per group of words instead of once per word.
+    """
+    word_list = ", ".join(words)
+    return (FEW_SHOT_PREFIX
+            + f"Now answer for each of these words in the same format: {word_list}\n\n"
+            + prompt_tail(words[0]))
+
+def split_packed_response(response_text, words):
+    """
+    Split the output of a packed prompt into one "Word: ..." block per requested word.
+    Words the model skipped get an empty block.
+    """
+    blocks = {}
+    for block in re.split(r'(?m)^(?=Word:)', response_text):
+        match = re.match(r'Word:\s*([^\n]+)', block)
+        if match:
+            blocks.setdefault(match.group(1).strip().lower(), block)
     
-    return prompt.format(word)
+    return [blocks.get(word.lower(), "") for word in words]
 
 def extract_definition_from_response(response_text):
     """
@@ -120,23 +216,33 @@ def extract_definition_from_response(response_text):
     
     return result
 
-def validate_entry(entry, headword):
+def validate_entry(entry, headword, fallbacks=None):
     """
     Validate that the generated entry is correct and complete.
+    Every field that had to be filled in is counted in the fallbacks Counter, if given.
     """
-    # Check if headword is present and matches expected headword
-    if not entry["headword"] or headword.lower() not in entry["headword"].lower():
-        entry["headword"] = headword
+    if fallbacks is None:
+        fallbacks = Counter()
+    
+    # The entry always carries the requested word, which resume and shard merges key on;
+    # an echo that differs from it ("Ilé", "Ilé-ìwé" for "ilé") counts as a fallback
+    if headword_key(entry["headword"] or '') != headword_key(headword):
+        fallbacks["headword"] += 1
+    entry["headword"] = headword
     
     # Check if part of speech is present
     if not entry["pos"]:
         entry["pos"] = "noun"  # Default to noun
+        fallbacks["pos"] += 1
     
     # Check if at least one synonym is present
     if not entry["synonyms"]:
         entry["synonyms"] = [headword]  # Use the headword as a fallback
+        fallbacks["synonyms_missing"] += 1
     
     # If less than 5 synonyms, duplicate some
+    if len(entry["synonyms"]) < 5:
+        fallbacks["synonyms_padded"] += 1
     while len(entry["synonyms"]) < 5:
         if len(entry["synonyms"]) > 0:
             entry["synonyms"].append(entry["synonyms"][0])
@@ -146,80 +252,399 @@ def validate_entry(entry, headword):
     # Check if definition is present
     if not entry["definition"]:
         entry["definition"] = f"A Yoruba word: {headword}"
+        fallbacks["definition"] += 1
     
     # Check if examples are present
     if not entry["example"]["yorùbá"]:
         entry["example"]["yorùbá"] = f"{headword}."
+        fallbacks["example_yo"] += 1
     
     if not entry["example"]["en"]:
         entry["example"]["en"] = f"{headword}."
+        fallbacks["example_en"] += 1
     
     return entry
 
-def generate_entries_for_batch(model, tokenizer, words_batch, max_length=512):
+def new_generation_stats():
     """
-    Generate detailed entries for a batch of Yoruba words.
+    Empty telemetry for a generation run: token totals, per-batch records and
+    how often validate_entry had to fill in each field.
     """
-    entries = []
+    return {"input_tokens": 0, "output_tokens": 0, "entries": 0, "errors": 0,
+            "seconds": 0.0, "batches": [], "fallbacks": Counter()}
+
+def merge_generation_stats(stats_list):
+    """
+    Combine the telemetry of several runs, e.g. the shards of a parallel run.
+    Seconds is the longest run, since shards generate concurrently.
+    """
+    merged = new_generation_stats()
+    for stats in stats_list:
+        for key in ("input_tokens", "output_tokens", "entries", "errors"):
+            merged[key] += stats[key]
+        merged["seconds"] = max(merged["seconds"], stats["seconds"])
+        merged["batches"].extend(stats["batches"])
+        merged["fallbacks"].update(stats["fallbacks"])
+    return merged
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of a list of numbers.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def summarize_generation_stats(stats):
+    """
+    Aggregate throughput, batch latency and fallback rates from the raw telemetry.
+    """
+    latencies = [batch["seconds"] for batch in stats["batches"]]
+    entries = stats["entries"]
+    seconds = stats["seconds"]
+    
+    return {
+        "entries": entries,
+        "batches": len(stats["batches"]),
+        "errors": stats["errors"],
+        "seconds": round(seconds, 3),
+        "input_tokens": stats["input_tokens"],
+        "output_tokens": stats["output_tokens"],
+        "entries_per_sec": round(entries / seconds, 3) if seconds > 0 else 0.0,
+        "output_tokens_per_sec": round(stats["output_tokens"] / seconds, 3) if seconds > 0 else 0.0,
+        "batch_latency": {
+            "mean": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+            "p50": round(percentile(latencies, 0.5), 3),
+            "p95": round(percentile(latencies, 0.95), 3),
+            "max": round(max(latencies), 3) if latencies else 0.0
+        },
+        "fallback_rates": {
+            field: round(count / entries, 4) if entries else 0.0
+            for field, count in sorted(stats["fallbacks"].items())
+        }
+    }
+
+def write_generation_stats(stats, stats_file):
+    """
+    Write the summary and per-batch records to a JSON file and print the summary.
+    """
+    summary = summarize_generation_stats(stats)
+    report = {"summary": summary, "fallbacks": dict(stats["fallbacks"]), "batches": stats["batches"]}
+    
+    with open(stats_file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    
+    print(f"Generation stats ({stats_file}):")
+    print(f"  {summary['entries']} entries in {summary['batches']} batches, {summary['errors']} failed batches")
+    print(f"  {summary['entries_per_sec']:.2f} entries/sec, {summary['output_tokens_per_sec']:.1f} output tokens/sec")
+    latency = summary["batch_latency"]
+    print(f"  Batch latency: mean {latency['mean']:.2f}s, p50 {latency['p50']:.2f}s, "
+          f"p95 {latency['p95']:.2f}s, max {latency['max']:.2f}s")
+    for field, rate in summary["fallback_rates"].items():
+        print(f"  Fallback {field}: {stats['fallbacks'][field]} ({rate:.1%})")
+
+def available_memory_bytes():
+    """
+    Memory free for generation: free GPU memory on CUDA, otherwise available system RAM.
+    """
+    if DEVICE.type == 'cuda':
+        free, _ = torch.cuda.mem_get_info(DEVICE)
+        return free
+    
+    try:
+        import psutil
+        return psutil.virtual_memory().available
+    except ImportError:
+        pass
+    
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+def choose_batch_size(model, max_length=512, memory_fraction=0.5, max_batch_size=256):
+    """
+    Pick a generation batch size that fits in a fraction of the available memory.
+    """
+    memory = available_memory_bytes()
+    if memory is None:
+        return 20
+    
+    config = model.config
+    hidden = getattr(config, 'd_model', None) or getattr(config, 'hidden_size', 512)
+    layers = (getattr(config, 'num_layers', None) or 6) + (getattr(config, 'num_decoder_layers', None) or 6)
+    bytes_per_value = next(model.parameters()).element_size()
+    
+    # Rough per-sequence cost: hidden states plus the decoder's cached keys and values
+    # for every layer over the full sequence length, with headroom for activations
+    per_sequence = 4 * max_length * hidden * layers * bytes_per_value
+    
+    batch_size = int(memory * memory_fraction // per_sequence)
+    return max(1, min(batch_size, max_batch_size))
+
+def generate_entries_for_batch(model, tokenizer, words_batch, max_length=512, stats=None,
+                               prompt_style='few-shot', words_per_prompt=5):
+    """
+    Generate detailed entries for a batch of Yoruba words with a single generate call.
+    """
+    if prompt_style == 'packed':
+        groups = [words_batch[i:i+words_per_prompt] for i in range(0, len(words_batch), words_per_prompt)]
+        prompts = [create_packed_prompt(group) for group in groups]
+    elif prompt_style == 'compact':
+        groups = [[word] for word in words_batch]
+        prompts = [create_compact_prompt(word) for word in words_batch]
+    else:
+        groups = [[word] for word in words_batch]
+        prompts = [create_prompt(word) for word in words_batch]
+    
+    # Tokenize the whole batch, padding to the longest prompt
+    inputs = tokenizer(prompts, return_tensors="pt", max_length=max_length,
+                       truncation=True, padding=True).to(model.device)
     
-    for word in words_batch:
-        prompt = create_prompt(word)
+    # Generate responses for every prompt at once
+    with torch.no_grad():
+        outputs = model.generate(
+            **inputs, 
+            max_length=max_length,
+            num_return_sequences=1,
+            temperature=0.7,
+            top_p=0.9,
+            do_sample=True
+        )
+    
+    # Decode the responses
+    responses = tokenizer.batch_decode(outputs, skip_special_tokens=True)
+    
+    fallbacks = None
+    if stats is not None:
+        stats["input_tokens"] += int(inputs["attention_mask"].sum())
+        stats["output_tokens"] += int((outputs != tokenizer.pad_token_id).sum())
+        fallbacks = stats["fallbacks"]
+    
+    entries = []
+    for group, response in zip(groups, responses):
+        # The model continues from the first word's tail; parse only that, not the examples
+        text = prompt_tail(group[0]) + response
+        blocks = split_packed_response(text, group) if len(group) > 1 else [text]
         
-        # Tokenize the prompt
-        inputs = tokenizer(prompt, return_tensors="pt", max_length=max_length, truncation=True).to(DEVICE)
+        for word, block in zip(group, blocks):
+            # Extract and validate the entry
+            entry = extract_definition_from_response(block)
+            entry = validate_entry(entry, word, fallbacks)
+            
+            entries.append(entry)
+    
+    return entries
+
+def benchmark_prompt_styles(model, tokenizer, words, batch_size, words_per_prompt=5, rounds=2):
+    """
+    Time every prompt style on the same words and compare throughput with few-shot.
+    """
+    sample = words[:batch_size * rounds]
+    if not sample:
+        print("No words to benchmark.")
+        return
+    
+    print(f"Benchmarking prompt styles on {len(sample)} words in batches of {batch_size}...")
+    results = {}
+    for style in PROMPT_STYLES:
+        stats = new_generation_stats()
+        start_time = time.time()
+        for i in range(0, len(sample), batch_size):
+            generate_entries_for_batch(model, tokenizer, sample[i:i+batch_size], stats=stats,
+                                       prompt_style=style, words_per_prompt=words_per_prompt)
+        elapsed = time.time() - start_time
+        results[style] = (len(sample) / elapsed if elapsed > 0 else 0, stats["input_tokens"] / len(sample))
+    
+    baseline = results['few-shot'][0]
+    for style, (words_per_sec, tokens_per_word) in results.items():
+        speedup = words_per_sec / baseline if baseline else 0
+        print(f"  {style:9s} {words_per_sec:7.2f} words/sec, {tokens_per_word:6.1f} prompt tokens/word, "
+              f"{speedup:.2f}x few-shot")
+
+def iter_generated_batches(model, tokenizer, words, batch_size, stats, desc="Processing batches",
+                           prompt_style='few-shot', words_per_prompt=5):
+    """
+    Generate entries batch by batch, yielding each batch's validated entries as soon
+    as it is done. Latency, token counts and failures are recorded in stats.
+    """
+    num_batches = (len(words) + batch_size - 1) // batch_size
+    start_time = time.time()
+    
+    pbar = tqdm(range(num_batches), desc=desc)
+    for i in pbar:
+        start_idx = i * batch_size
+        end_idx = min((i + 1) * batch_size, len(words))
+        batch = words[start_idx:end_idx]
         
-        # Generate response
-        with torch.no_grad():
-            outputs = model.generate(
-                **inputs, 
-                max_length=max_length,
-                num_return_sequences=1,
-                temperature=0.7,
-                top_p=0.9,
-                do_sample=True
-            )
+        # Generate entries for this batch
+        batch_start = time.time()
+        input_tokens, output_tokens = stats["input_tokens"], stats["output_tokens"]
+        try:
+            entries = generate_entries_for_batch(model, tokenizer, batch, stats=stats,
+                                                 prompt_style=prompt_style,
+                                                 words_per_prompt=words_per_prompt)
+        except Exception as e:
+            print(f"Error processing batch {i+1}/{num_batches}: {e}")
+            stats["errors"] += 1
+            entries = []
         
-        # Decode the response
-        response = tokenizer.decode(outputs[0], skip_special_tokens=True)
+        batch_seconds = time.time() - batch_start
+        batch_output_tokens = stats["output_tokens"] - output_tokens
+        stats["batches"].append({
+            "batch": i,
+            "run": desc,
+            "words": len(batch),
+            "entries": len(entries),
+            "seconds": round(batch_seconds, 4),
+            "input_tokens": stats["input_tokens"] - input_tokens,
+            "output_tokens": batch_output_tokens,
+            "tokens_per_sec": round(batch_output_tokens / batch_seconds, 2) if batch_seconds > 0 else 0.0
+        })
         
-        # Extract and validate the entry
-        entry = extract_definition_from_response(prompt + response)
-        entry = validate_entry(entry, word)
+        if entries:
+            yield entries
         
-        entries.append(entry)
-    
-    return entries
+        elapsed = time.time() - start_time
+        pbar.set_postfix(tokens_per_sec=f"{stats['output_tokens'] / elapsed:.1f}" if elapsed > 0 else "0")
 
-def process_all_words(model, tokenizer, words, batch_size=20, output_file="yoruba_synonyms.jsonl"):
+def report_generation_rate(stats, elapsed):
     """
-    Process all words in batches, generate entries, and save to a JSONL file.
+    Print the token throughput of a finished generation run.
+    """
+    if elapsed > 0:
+        print(f"Generated {stats['output_tokens']} tokens from {stats['input_tokens']} prompt tokens "
+              f"in {elapsed:.1f} seconds ({stats['output_tokens'] / elapsed:.1f} tokens/sec)")
+
+def process_all_words(model, tokenizer, words, batch_size=20, output_file="yoruba_synonyms.jsonl",
+                      fsync_interval=30, desc="Processing batches", prompt_style='few-shot',
+                      words_per_prompt=5, stats=None):
+    """
+    Process all words in batches, generate entries, and append them to a JSONL file.
+    The file is flushed after every batch and fsynced at least every fsync_interval seconds.
+    Per-batch latency, token counts and field fallbacks are recorded in stats, if given.
     """
-    num_batches = (len(words) + batch_size - 1) // batch_size
     processed_entries = 0
+    if stats is None:
+        stats = new_generation_stats()
+    start_time = time.time()
+    last_sync = start_time
     
-    with open(output_file, 'w', encoding='utf-8') as f:
-        for i in tqdm(range(num_batches), desc="Processing batches"):
-            start_idx = i * batch_size
-            end_idx = min((i + 1) * batch_size, len(words))
-            batch = words[start_idx:end_idx]
-            
-            # Generate entries for this batch
-            try:
-                entries = generate_entries_for_batch(model, tokenizer, batch)
-                
-                # Save entries to file
-                for entry in entries:
-                    f.write(json.dumps(entry, ensure_ascii=False) + '\n')
-                    processed_entries += 1
-            
-            except Exception as e:
-                print(f"Error processing batch {i+1}/{num_batches}: {e}")
+    with open(output_file, 'a', encoding='utf-8') as f:
+        for entries in iter_generated_batches(model, tokenizer, words, batch_size, stats, desc,
+                                              prompt_style, words_per_prompt):
+            # Save entries to file
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                processed_entries += 1
             
-            # Add a small delay to avoid GPU overheating
-            time.sleep(1)
+            # Make finished batches durable so a crash never costs more than the current one
+            f.flush()
+            if time.time() - last_sync >= fsync_interval:
+                os.fsync(f.fileno())
+                last_sync = time.time()
+        
+        os.fsync(f.fileno())
+    
+    elapsed = time.time() - start_time
+    stats["entries"] += processed_entries
+    stats["seconds"] += elapsed
+    report_generation_rate(stats, elapsed)
     
     return processed_entries
 
+def shard_path(output_file, shard):
+    """
+    Path of the JSONL file a parallel worker writes, e.g. yoruba_synonyms.jsonl.shard0.
+    """
+    return f"{output_file}.shard{shard}"
+
+def _generate_shard(task):
+    """
+    Worker process: load a private model and generate one shard of the word list.
+    """
+    (model_name, words, output_file, batch_size, quantize, threads, shard, workers,
+     prompt_style, words_per_prompt) = task
+    
+    # Split the cores between workers instead of letting each one use all of them
+    torch.set_num_threads(threads)
+    
+    model, tokenizer = load_model_and_tokenizer(model_name, quantize)
+    batch_size = batch_size or choose_batch_size(model, memory_fraction=0.5 / workers)
+    
+    stats = new_generation_stats()
+    processed = process_all_words(model, tokenizer, words, batch_size, output_file, desc=f"Shard {shard}",
+                                  prompt_style=prompt_style, words_per_prompt=words_per_prompt,
+                                  stats=stats)
+    return processed, stats
+
+def merge_shards(output_file):
+    """
+    Append the entries from every shard file to output_file, skipping headwords it
+    already has, then delete the shards. Returns the number of entries merged.
+    """
+    shard_files = sorted(glob.glob(glob.escape(output_file) + '.shard*'))
+    if not shard_files:
+        return 0
+    
+    completed = load_completed_words(output_file)
+    merged = 0
+    
+    with open(output_file, 'a', encoding='utf-8') as out:
+        for shard_file in shard_files:
+            # Also drops a partial last line from a worker that crashed mid-write
+            load_completed_words(shard_file)
+            with open(shard_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    entry = json.loads(line)
+                    if headword_key(entry["headword"]) in completed:
+                        continue
+                    out.write(line)
+                    completed.add(headword_key(entry["headword"]))
+                    merged += 1
+        
+        out.flush()
+        os.fsync(out.fileno())
+    
+    for shard_file in shard_files:
+        os.remove(shard_file)
+    
+    return merged
+
+def process_in_parallel(model_name, words, workers, batch_size=None, output_file="yoruba_synonyms.jsonl",
+                        quantize=False, prompt_style='few-shot', words_per_prompt=5, stats=None):
+    """
+    Partition the words across worker processes that each load their own model and
+    write a shard file, then merge the shards into output_file.
+    The telemetry of every shard is merged into stats, if given.
+    """
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    tasks = [
+        (model_name, words[shard::workers], shard_path(output_file, shard), batch_size,
+         quantize, threads, shard, workers, prompt_style, words_per_prompt)
+        for shard in range(workers)
+        if words[shard::workers]
+    ]
+    if not tasks:
+        return 0
+    
+    # Spawn rather than fork so each worker starts with a clean torch runtime
+    context = mp.get_context('spawn')
+    with context.Pool(len(tasks)) as pool:
+        results = list(pool.imap_unordered(_generate_shard, tasks))
+    processed = sum(count for count, _ in results)
+    
+    if stats is not None:
+        merged_stats = merge_generation_stats([shard_stats for _, shard_stats in results])
+        for key, value in merged_stats.items():
+            stats[key] = value
+    
+    merged = merge_shards(output_file)
+    print(f"Merged {merged} entries from {len(tasks)} shards into {output_file}")
+    
+    return processed
+
 def main():
     parser = argparse.ArgumentParser(description='Generate Yoruba synonyms using a transformer model')
     parser.add_argument('--input', type=str, default='common_200.json',
@@ -228,25 +653,69 @@ def main():
                         help='Output JSONL file for synonym entries')
     parser.add_argument('--model', type=str, default='google/mt5-small',
                         help='Transformer model to use')
-    parser.add_argument('--batch-size', type=int, default=20,
-                        help='Batch size for processing')
+    parser.add_argument('--batch-size', type=int, default=None,
+                        help='Words per generate call (default: chosen from available memory)')
+    parser.add_argument('--restart', action='store_true',
+                        help='Discard existing output instead of resuming from it')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of generation processes, each with its own model')
+    parser.add_argument('--quantize', action='store_true',
+                        help='Run the model with int8 dynamically-quantized linear layers on CPU')
+    parser.add_argument('--prompt-style', type=str, default='few-shot', choices=PROMPT_STYLES,
+                        help='few-shot: examples per word; compact: instructions only; '
+                             'packed: one few-shot prompt for several words')
+    parser.add_argument('--words-per-prompt', type=int, default=5,
+                        help='Words per prompt with --prompt-style packed')
+    parser.add_argument('--benchmark-prompts', action='store_true',
+                        help='Compare the throughput of every prompt style on the first words and exit')
+    parser.add_argument('--stats-output', type=str, default='generation_stats.json',
+                        help='JSON file for batch latency, token throughput and fallback counts')
     
     args = parser.parse_args()
     
-    # Load the model and tokenizer
-    model, tokenizer = load_model_and_tokenizer(args.model)
-    
     # Load common words
     print(f"Loading common Yoruba words from {args.input}...")
-    words = load_common_words(args.input)
+    words = dedupe_words(load_common_words(args.input))
+    
+    # Resume: skip words an earlier run already wrote, including unmerged shards
+    if args.restart:
+        for path in [args.output] + glob.glob(glob.escape(args.output) + '.shard*'):
+            if os.path.exists(path):
+                os.remove(path)
+    elif merge_shards(args.output):
+        print(f"Merged leftover shard files into {args.output}")
+    completed = load_completed_words(args.output)
+    if completed:
+        print(f"Resuming: {len(completed)} entries already in {args.output}")
+        words = [word for word in words if headword_key(word) not in completed]
     
-    # Process words
-    print(f"Generating entries for {len(words)} words in batches of {args.batch_size}...")
-    processed = process_all_words(model, tokenizer, words, args.batch_size, args.output)
+    if args.benchmark_prompts:
+        model, tokenizer = load_model_and_tokenizer(args.model, args.quantize)
+        batch_size = args.batch_size or choose_batch_size(model)
+        benchmark_prompt_styles(model, tokenizer, words, batch_size, args.words_per_prompt)
+        return
+    
+    stats = new_generation_stats()
+    if args.workers > 1:
+        print(f"Generating entries for {len(words)} words with {args.workers} worker processes...")
+        processed = process_in_parallel(args.model, words, args.workers, args.batch_size,
+                                        args.output, args.quantize, args.prompt_style,
+                                        args.words_per_prompt, stats)
+    else:
+        # Load the model and tokenizer
+        model, tokenizer = load_model_and_tokenizer(args.model, args.quantize)
+        batch_size = args.batch_size or choose_batch_size(model)
+        
+        # Process words
+        print(f"Generating entries for {len(words)} words in batches of {batch_size}...")
+        processed = process_all_words(model, tokenizer, words, batch_size, args.output,
+                                      prompt_style=args.prompt_style,
+                                      words_per_prompt=args.words_per_prompt, stats=stats)
     
     print(f"Processing complete!")
     print(f"Entries saved: {processed}")
     print(f"Entries saved to {args.output}")
+    write_generation_stats(stats, args.stats_output)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -6,76 +6,780 @@ get_common.py - Extract and count the most common Yoruba words from Wikipedia du
 """
 
 import os
+import sys
+import bz2
 import json
+import time
 import re
+import xml.etree.ElementTree as ET
 import glob
+import zlib
+import hashlib
+import sqlite3
+import multiprocessing as mp
 from collections import Counter
+from collections.abc import Mapping
 import unicodedata
 import argparse
+import numpy as np
 from tqdm import tqdm
+from frequency_table import write_frequency_table
 
-def is_yoruba_word(word):
+# Characters used in Yoruba, after NFC normalization. Tone marks on ẹ, ọ and ṣ
+# (and mid-tone macrons) have no precomposed form and stay combining characters
+YORUBA_CHARS = frozenset('abcdeẹfgihkjlmnopqrstuúwxyzàáèéẹ̀ẹ́ìíòóọ̀ọ́ùúṣ̀ṣ́ńǹḿ'
+                         '\u0300\u0301\u0304\u0323')
+
+# Compiled once instead of on every word. Combining marks are not \w, so they are
+# matched explicitly; otherwise ọ̀rọ̀ would split into ọ and rọ
+WORD_RE = re.compile(r'[\w\u0300-\u036f]+')
+DIGITS_RE = re.compile(r'\d+')
+
+def normalize_token(word):
     """
-    Check if a word is likely a valid Yoruba word by checking for tone marks
-    and other Yoruba-specific characters.
+    Lowercase a token from WORD_RE and strip its digits, or return None if it
+    is not a Yoruba word of at least two letters.
     """
-    # Remove punctuation and digits
-    word = re.sub(r'[^\w\s]', '', word)
-    word = re.sub(r'\d+', '', word)
+    # Tokens never contain punctuation, so only digits ever need removing
+    word = word.lower()
+    if not YORUBA_CHARS.issuperset(word):
+        word = DIGITS_RE.sub('', word)
+        if not YORUBA_CHARS.issuperset(word):
+            return None
     
-    if not word or len(word) < 2:
-        return False
+    # Count letters, not code points: ẹ̀ is one letter plus a combining tone mark
+    if len(word) < 4 and sum(1 for c in word if not unicodedata.combining(c)) < 2:
+        return None
+    return word
+
+def tokenize(text):
+    """
+    Iterate over the normalized Yoruba tokens of a piece of text.
+    """
+    # NFC first, so words typed with decomposed tone marks get the same tokens and
+    # match headwords looked up in the frequency table
+    if not unicodedata.is_normalized('NFC', text):
+        text = unicodedata.normalize('NFC', text)
+    return filter(None, map(normalize_token, WORD_RE.findall(text)))
+
+def line_text(line):
+    """
+    The text of one line of a WikiExtractor JSON file or a plain text file.
+    """
+    text = line
+    if line.startswith('{'):
+        # Parse the JSON line if it's in JSON format
+        try:
+            data = json.loads(line)
+            text = data.get('text', '') if isinstance(data, dict) else line
+        except json.JSONDecodeError:
+            # If not JSON, just use the line as text
+            pass
+    
+    return text if isinstance(text, str) else ''
+
+def count_tokens_in_line(line, counter):
+    """
+    Count the Yoruba tokens of one line of a WikiExtractor JSON file or a plain
+    text file straight into counter.
+    """
+    count_tokens_in_text(line_text(line), counter)
+
+def count_tokens_in_text(text, counter):
+    """
+    Count the Yoruba tokens of a piece of plain text straight into counter.
+    """
+    # Tokenize, filter and normalize lazily so no token list is built
+    counter.update(tokenize(text))
+
+def count_tokens_in_file(file_path, counter):
+    """
+    Count the tokens of a single file into counter, line by line.
+    """
+    try:
+        # Undecodable bytes become U+FFFD, as in count_tokens_in_chunk, so one bad
+        # byte does not cost the rest of the file
+        with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                count_tokens_in_line(line, counter)
+    except Exception as e:
+        print(f"Error processing {file_path}: {e}")
     
-    # Characters used in Yoruba
-    yoruba_chars = set('abcdeẹfgihkjlmnopqrstuúwxyzàáèéẹ̀ẹ́ìíòóọ̀ọ́ùúṣ̀ṣ́')
+    return counter
+
+def iter_file_counts_in_parallel(files, workers, chunk_bytes=64 * 1024 * 1024):
+    """
+    Count files with a worker pool like count_tokens_in_parallel, but yield a
+    separate (path, Counter) for every file once all of its chunks are done.
+    """
+    chunks = plan_chunks(files, chunk_bytes)
+    print(f"Counting {len(chunks)} chunks with {workers} worker processes...")
+    current_path = None
+    current = Counter()
     
-    # Check if all characters are in yoruba_chars
-    return all(c.lower() in yoruba_chars for c in word)
+    with mp.Pool(workers) as pool:
+        # imap keeps chunk order, so each file's chunks arrive back to back
+        results = tqdm(pool.imap(count_tokens_in_chunk, chunks), total=len(chunks))
+        for (file_path, _, _), counter in zip(chunks, results):
+            if file_path != current_path and current_path is not None:
+                yield current_path, current
+                current = Counter()
+            current_path = file_path
+            current.update(counter)
+    
+    if current_path is not None:
+        yield current_path, current
 
-def normalize_yoruba_word(word):
+def file_hash(file_path):
     """
-    Normalize a Yoruba word: lowercase and preserve tone marks.
+    BLAKE2b digest of a file's contents, read in 1 MB blocks.
     """
-    # Lowercase the word
-    word = word.lower()
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+# Bump whenever tokenization or normalization changes, so cached counts made by
+# the old tokenizer are thrown away instead of being reused
+TOKENIZER_VERSION = 2
+
+class CountCache:
+    """
+    Per-file token counts in an SQLite file, so unchanged files are not tokenized again.
     
-    # Remove non-alphabetic characters except tone marks
-    word = re.sub(r'[^a-zẹọṣàáèéẹ̀ẹ́ìíòóọ̀ọ́ùú]', '', word)
+    Entries are keyed by absolute path. A matching size and mtime is trusted as is;
+    if only the mtime changed, the content hash decides. Counts are stored as
+    zlib-compressed JSON. A cache written with another TOKENIZER_VERSION is emptied.
+    """
     
-    return word
+    def __init__(self, cache_file):
+        self.db = sqlite3.connect(cache_file)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS file_counts "
+            "(path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, hash TEXT, counts BLOB)"
+        )
+        (version,) = self.db.execute("PRAGMA user_version").fetchone()
+        if version != TOKENIZER_VERSION:
+            if version:
+                print(f"Count cache {cache_file} was made by another tokenizer; recounting every file")
+            self.db.execute("DELETE FROM file_counts")
+            self.db.execute(f"PRAGMA user_version = {TOKENIZER_VERSION}")
+    
+    def lookup(self, file_path):
+        """
+        Cached Counter for the file, or None if it is new or has changed.
+        """
+        path = os.path.abspath(file_path)
+        row = self.db.execute(
+            "SELECT size, mtime_ns, hash, counts FROM file_counts WHERE path = ?", (path,)
+        ).fetchone()
+        if row is None:
+            return None
+        
+        size, mtime_ns, digest, counts = row
+        stat = os.stat(path)
+        if stat.st_size != size:
+            return None
+        if stat.st_mtime_ns != mtime_ns:
+            # Touched or copied: only reuse the counts if the contents are the same
+            if file_hash(path) != digest:
+                return None
+            self.db.execute("UPDATE file_counts SET mtime_ns = ? WHERE path = ?", (stat.st_mtime_ns, path))
+        
+        return Counter(json.loads(zlib.decompress(counts)))
+    
+    def store(self, file_path, counter):
+        path = os.path.abspath(file_path)
+        stat = os.stat(path)
+        counts = zlib.compress(json.dumps(counter, ensure_ascii=False).encode('utf-8'))
+        self.db.execute(
+            "INSERT OR REPLACE INTO file_counts VALUES (?, ?, ?, ?, ?)",
+            (path, stat.st_size, stat.st_mtime_ns, file_hash(path), counts)
+        )
+    
+    def prune(self, files):
+        """
+        Forget files that are no longer part of the corpus.
+        """
+        keep = set(os.path.abspath(file_path) for file_path in files)
+        stale = [path for (path,) in self.db.execute("SELECT path FROM file_counts") if path not in keep]
+        self.db.executemany("DELETE FROM file_counts WHERE path = ?", [(path,) for path in stale])
+    
+    def close(self):
+        self.db.commit()
+        self.db.close()
 
-def extract_tokens_from_file(file_path):
+def count_files_cached(files, cache_file, token_counter, workers=1, chunk_bytes=64 * 1024 * 1024):
     """
-    Extract tokens from a single file.
+    Add the cached counts of unchanged files to token_counter and tokenize only
+    the new or changed ones, storing their counts for the next run.
     """
-    tokens = []
+    cache = CountCache(cache_file)
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
+        changed = []
+        for file_path in files:
+            counts = cache.lookup(file_path)
+            if counts is None:
+                changed.append(file_path)
+            else:
+                token_counter.update(counts)
+        
+        print(f"{len(files) - len(changed)} files unchanged since the last run, tokenizing {len(changed)}")
+        if workers > 1:
+            file_counts = iter_file_counts_in_parallel(changed, workers, chunk_bytes)
+        else:
+            file_counts = ((file_path, count_tokens_in_file(file_path, Counter())) for file_path in tqdm(changed))
+        
+        for file_path, counts in file_counts:
+            cache.store(file_path, counts)
+            token_counter.update(counts)
+        
+        cache.prune(files)
+    finally:
+        cache.close()
+    
+    return token_counter
+
+# Wiki markup removed before counting, roughly what WikiExtractor drops
+COMMENT_RE = re.compile(r'<!--.*?-->', re.DOTALL)
+REF_RE = re.compile(r'<ref[^>/]*/>|<ref[^>]*>.*?</ref>', re.DOTALL | re.IGNORECASE)
+TEMPLATE_RE = re.compile(r'\{\{[^{}]*\}\}')
+TABLE_RE = re.compile(r'\{\|.*?\|\}', re.DOTALL)
+NAMESPACED_LINK_RE = re.compile(r'\[\[[^\[\]|]*:[^\[\]]*\]\]')
+LINK_RE = re.compile(r'\[\[(?:[^\[\]|]*\|)?([^\[\]]*)\]\]')
+EXTERNAL_LINK_RE = re.compile(r'\[https?://[^\s\]]*\s*([^\]]*)\]')
+TAG_RE = re.compile(r'<[^>]+>')
+URL_RE = re.compile(r'https?://\S+')
+
+def strip_wiki_markup(text):
+    """
+    Reduce wikitext to plain prose with a few regex passes: drop comments,
+    references, templates, tables, files and categories, and keep link labels.
+    """
+    text = COMMENT_RE.sub(' ', text)
+    text = REF_RE.sub(' ', text)
+    
+    # Templates nest, so strip the innermost ones until none are left
+    for _ in range(5):
+        text, count = TEMPLATE_RE.subn(' ', text)
+        if not count:
+            break
+    
+    text = TABLE_RE.sub(' ', text)
+    text = NAMESPACED_LINK_RE.sub(' ', text)
+    text = LINK_RE.sub(r'\1', text)
+    text = EXTERNAL_LINK_RE.sub(r'\1', text)
+    text = TAG_RE.sub(' ', text)
+    text = URL_RE.sub(' ', text)
+    return text
+
+def local_name(tag):
+    """
+    XML tag without its namespace, e.g. 'page' for '{http://www.mediawiki.org/xml/export-0.10/}page'.
+    """
+    return tag.rsplit('}', 1)[-1]
+
+def article_text(page):
+    """
+    Plain text of a <page> element if it is an article (namespace 0, not a redirect), otherwise None.
+    """
+    namespace = '0'
+    text = None
+    for child in page.iter():
+        name = local_name(child.tag)
+        if name == 'ns':
+            namespace = child.text
+        elif name == 'redirect':
+            return None
+        elif name == 'text':
+            text = child.text
+    
+    if namespace != '0' or not text:
+        return None
+    
+    return strip_wiki_markup(text)
+
+def count_page(page, counter):
+    """
+    Count the tokens of one <page> element if it is an article.
+    """
+    text = article_text(page)
+    if text is None:
+        return False
+    
+    count_tokens_in_text(text, counter)
+    return True
+
+def iter_dump_pages(dump_file):
+    """
+    Yield the <page> elements of a pages-articles.xml.bz2 dump one at a time,
+    decompressing and parsing incrementally.
+    """
+    with bz2.open(dump_file, 'rb') as f:
+        context = ET.iterparse(f, events=('start', 'end'))
+        _, root = next(context)
+        for event, element in context:
+            if event != 'end' or local_name(element.tag) != 'page':
+                continue
+            yield element
+            
+            # Drop finished pages so memory stays flat over the whole dump
+            root.clear()
+
+def count_dump(dump_file, counter=None):
+    """
+    Stream a pages-articles.xml.bz2 dump: decompress incrementally, parse the XML
+    page by page and count article tokens without writing anything to disk.
+    """
+    if counter is None:
+        counter = Counter()
+    pages = 0
+    
+    with tqdm(unit=" pages") as pbar:
+        for page in iter_dump_pages(dump_file):
+            if count_page(page, counter):
+                pages += 1
+                pbar.update(1)
+    
+    print(f"Counted {pages} articles from {dump_file}")
+    return counter
+
+def load_stream_offsets(index_file, dump_file):
+    """
+    Byte offsets of the bz2 streams of a multistream dump, from its
+    multistream-index.txt(.bz2) file (lines of 'offset:page_id:title').
+    """
+    opener = bz2.open if index_file.endswith('.bz2') else open
+    offsets = set()
+    with opener(index_file, 'rt', encoding='utf-8') as f:
+        for line in f:
+            offset = line.split(':', 1)[0]
+            if offset.isdigit():
+                offsets.add(int(offset))
+    
+    # The first stream holds the <siteinfo> header and isn't listed in the index
+    offsets.add(0)
+    offsets.add(os.path.getsize(dump_file))
+    return sorted(offsets)
+
+PAGE_RE = re.compile(r'<page>.*?</page>', re.DOTALL)
+
+# Compressed bytes read at a time by count_dump_range
+DUMP_READ_BYTES = 1024 * 1024
+
+def count_stream_pages(xml_bytes, counter):
+    """
+    Count the pages in the decompressed XML of one bz2 stream, returning how many
+    articles were counted.
+    """
+    pages = 0
+    for match in PAGE_RE.finditer(xml_bytes.decode('utf-8', errors='replace')):
+        try:
+            page = ET.fromstring(match.group(0))
+        except ET.ParseError:
+            continue
+        if count_page(page, counter):
+            pages += 1
+    
+    return pages
+
+def count_dump_range(task):
+    """
+    Worker: decompress the whole bz2 streams in a byte range of a multistream dump
+    and count the pages they contain.
+    """
+    dump_file, start, end = task
+    counter = Counter()
+    pages = 0
+    
+    # Every stream is a complete bz2 file of about 100 pages, so read the range a
+    # block at a time and parse each stream as soon as it ends; only one stream's
+    # XML is held in memory at once
+    decompressor = bz2.BZ2Decompressor()
+    parts = []
+    with open(dump_file, 'rb') as f:
+        f.seek(start)
+        remaining = end - start
+        data = b''
+        while True:
+            if not data:
+                data = f.read(min(DUMP_READ_BYTES, remaining))
+                remaining -= len(data)
+                if not data:
+                    break
+            parts.append(decompressor.decompress(data))
+            data = b''
+            if decompressor.eof:
+                pages += count_stream_pages(b''.join(parts), counter)
+                parts = []
+                data = decompressor.unused_data
+                decompressor = bz2.BZ2Decompressor()
+    
+    # A stream cut off at the end of the range still gets its complete pages counted
+    if parts:
+        pages += count_stream_pages(b''.join(parts), counter)
+    
+    return counter, pages
+
+def count_dump_in_parallel(dump_file, index_file, workers, chunk_bytes=64 * 1024 * 1024, counter=None):
+    """
+    Decompress and count a multistream dump block-parallel: consecutive bz2 streams
+    are grouped into ranges of about chunk_bytes and handed to a worker pool.
+    """
+    offsets = load_stream_offsets(index_file, dump_file)
+    
+    ranges = []
+    start = offsets[0]
+    for offset in offsets[1:]:
+        if offset - start >= chunk_bytes or offset == offsets[-1]:
+            ranges.append((dump_file, start, offset))
+            start = offset
+    
+    print(f"Counting {len(offsets) - 1} bz2 streams in {len(ranges)} ranges with {workers} worker processes...")
+    if counter is None:
+        counter = Counter()
+    pages = 0
+    
+    with mp.Pool(workers) as pool:
+        for range_counter, range_pages in tqdm(pool.imap_unordered(count_dump_range, ranges), total=len(ranges)):
+            counter.update(range_counter)
+            pages += range_pages
+    
+    print(f"Counted {pages} articles from {dump_file}")
+    return counter
+
+def iter_corpus_texts(files, dump_file=None):
+    """
+    Yield the text of every line of the input files, or of every article of the dump.
+    """
+    if dump_file:
+        for page in iter_dump_pages(dump_file):
+            text = article_text(page)
+            if text:
+                yield text
+        return
+    
+    for file_path in files:
+        with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
             for line in f:
-                try:
-                    # Parse the JSON line if it's in JSON format
-                    try:
-                        data = json.loads(line)
-                        text = data.get('text', '')
-                    except json.JSONDecodeError:
-                        # If not JSON, just use the line as text
-                        text = line
-                    
-                    # Tokenize the text - split by whitespace and punctuation
-                    words = re.findall(r'\b\w+\b', text)
-                    
-                    # Filter for Yoruba words and normalize
-                    for word in words:
-                        if is_yoruba_word(word):
-                            normalized = normalize_yoruba_word(word)
-                            if normalized:
-                                tokens.append(normalized)
-                except Exception as e:
-                    continue
+                yield line_text(line)
+
+class CooccurrenceCounter:
+    """
+    Symmetric windowed co-occurrence counts between the words of a fixed
+    vocabulary, accumulated into a sparse CSR matrix.
+    
+    Token IDs are buffered across texts, with window -1 separators between texts
+    so no window crosses a text boundary, and turned into pairs with vectorized
+    NumPy shifts once the buffer is full.
+    """
+    
+    def __init__(self, vocabulary, window=5, buffer_size=2000000):
+        from scipy import sparse
+        self.sparse = sparse
+        self.word_ids = {word: i for i, word in enumerate(vocabulary)}
+        self.size = len(vocabulary)
+        self.window = window
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.matrix = sparse.csr_matrix((self.size, self.size), dtype=np.float32)
+    
+    def add_text(self, text):
+        word_ids = self.word_ids
+        ids = [word_ids.get(token, -1) for token in tokenize(text)]
+        if len(ids) < 2:
+            return
+        self.buffer.extend(ids)
+        self.buffer.extend([-1] * self.window)
+        if len(self.buffer) >= self.buffer_size:
+            self._flush()
+    
+    def _flush(self):
+        ids = np.array(self.buffer, dtype=np.int64)
+        self.buffer = []
+        
+        rows, cols = [], []
+        for distance in range(1, self.window + 1):
+            left, right = ids[:-distance], ids[distance:]
+            keep = (left >= 0) & (right >= 0) & (left != right)
+            rows.append(left[keep])
+            cols.append(right[keep])
+        rows = np.concatenate(rows)
+        cols = np.concatenate(cols)
+        
+        # Count both directions; duplicate pairs are summed when converting to CSR
+        data = np.ones(2 * len(rows), dtype=np.float32)
+        pairs = self.sparse.coo_matrix(
+            (data, (np.concatenate([rows, cols]), np.concatenate([cols, rows]))),
+            shape=(self.size, self.size)
+        )
+        self.matrix = self.matrix + pairs.tocsr()
+    
+    def finish(self):
+        """
+        The accumulated co-occurrence counts as a CSR matrix.
+        """
+        if self.buffer:
+            self._flush()
+        return self.matrix
+
+def ppmi_matrix(cooccurrence, alpha=0.75):
+    """
+    Positive pointwise mutual information of a co-occurrence CSR matrix, with the
+    context distribution smoothed by alpha to damp the bias toward rare words.
+    """
+    matrix = cooccurrence.tocsr().astype(np.float64)
+    total = matrix.sum()
+    if total == 0:
+        return matrix
+    
+    word_counts = np.asarray(matrix.sum(axis=1)).ravel()
+    context_counts = np.asarray(matrix.sum(axis=0)).ravel() ** alpha
+    context_probs = context_counts / context_counts.sum()
+    
+    # Work on the stored values only, so the matrix stays sparse
+    rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    cols = matrix.indices
+    pmi = np.log(matrix.data / total) - np.log(word_counts[rows] / total) - np.log(context_probs[cols])
+    matrix.data = np.maximum(pmi, 0)
+    matrix.eliminate_zeros()
+    return matrix.astype(np.float32)
+
+def nearest_neighbours(vectors, k=10, batch_size=512):
+    """
+    Cosine top-k neighbours of every row of a sparse matrix, computed in batches
+    of rows against the whole matrix. Returns (ids, scores) arrays with k columns.
+    """
+    from scipy import sparse
+    
+    norms = np.sqrt(np.asarray(vectors.multiply(vectors).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    normalized = sparse.diags(1 / norms).dot(vectors).tocsr().astype(np.float32)
+    transposed = normalized.T.tocsc()
+    
+    size = normalized.shape[0]
+    k = min(k, size - 1)
+    ids = np.zeros((size, k), dtype=np.int32)
+    scores = np.zeros((size, k), dtype=np.float32)
+    
+    for start in tqdm(range(0, size, batch_size)):
+        end = min(start + batch_size, size)
+        similarities = normalized[start:end].dot(transposed).toarray()
+        # A word is never its own synonym
+        similarities[np.arange(end - start), np.arange(start, end)] = -1
+        
+        top = np.argpartition(-similarities, k, axis=1)[:, :k]
+        top_scores = np.take_along_axis(similarities, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        ids[start:end] = np.take_along_axis(top, order, axis=1)
+        scores[start:end] = np.take_along_axis(top_scores, order, axis=1)
+    
+    return ids, scores
+
+def build_synonym_candidates(files, dump_file, vocabulary, output_file, window=5, k=10, min_score=0.1):
+    """
+    Second pass over the corpus: co-occurrence counts over the vocabulary, PPMI
+    vectors and cosine neighbours, written as a JSON object mapping each word to
+    its candidates, best first: {"word": [{"word": ..., "score": cosine}, ...]}.
+    expand_massive_dictionary.py --candidates reads this file.
+    """
+    print(f"Counting co-occurrences of {len(vocabulary)} words within {window} tokens...")
+    start_time = time.time()
+    counter = CooccurrenceCounter(vocabulary, window)
+    for text in tqdm(iter_corpus_texts(files, dump_file), unit=" texts"):
+        counter.add_text(text)
+    cooccurrence = counter.finish()
+    print(f"Found {cooccurrence.nnz} co-occurring pairs in {time.time() - start_time:.1f} seconds")
+    
+    start_time = time.time()
+    vectors = ppmi_matrix(cooccurrence)
+    ids, scores = nearest_neighbours(vectors, k)
+    print(f"Computed {ids.shape[1]} neighbours per word in {time.time() - start_time:.1f} seconds")
+    
+    candidates = {}
+    for row, word in enumerate(vocabulary):
+        neighbours = [
+            {"word": vocabulary[col], "score": round(float(score), 4)}
+            for col, score in zip(ids[row], scores[row])
+            if score >= min_score
+        ]
+        if neighbours:
+            candidates[word] = neighbours
+    
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(candidates, f, ensure_ascii=False, indent=2)
+    
+    print(f"Saved synonym candidates for {len(candidates)} words to {output_file}")
+
+def peak_rss_mb():
+    """
+    Peak resident memory of this process and its finished workers, in MB.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return peak / scale
+
+class MisraGries:
+    """
+    Bounded-memory approximate word counter (Misra-Gries heavy hitters).
+    
+    Keeps at most 2 * capacity words. When that fills up, the (capacity + 1)-th
+    largest count is subtracted from every word and words at zero are dropped.
+    Estimates never exceed the true count and undercount it by at most
+    error_bound, which is itself at most total / (capacity + 1). Every word seen
+    more than that many times is guaranteed to be kept.
+    
+    Words tied at the subtracted count are all dropped, so a summary sized exactly
+    to N can return fewer than N words; see summary_capacity.
+    """
+    
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}
+        self.total = 0
+        self.error_bound = 0
+    
+    def update(self, tokens):
+        """
+        Count an iterable of tokens, or add a mapping of token -> count (like Counter.update).
+        """
+        if not isinstance(tokens, Mapping):
+            # Count the batch exactly at C speed first, then fold it in
+            tokens = Counter(tokens)
+        
+        counts = self.counts
+        for token, count in tokens.items():
+            counts[token] = counts.get(token, 0) + count
+            self.total += count
+        
+        if len(counts) > 2 * self.capacity:
+            self._prune()
+    
+    def _prune(self):
+        cutoff = sorted(self.counts.values(), reverse=True)[self.capacity]
+        self.counts = {token: count - cutoff for token, count in self.counts.items() if count > cutoff}
+        self.error_bound += cutoff
+    
+    def most_common(self, n=None):
+        """
+        The n words with the highest estimated counts, as (word, estimate) pairs.
+        """
+        ranked = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)
+        return ranked if n is None else ranked[:n]
+    
+    def __len__(self):
+        return len(self.counts)
+
+def summary_capacity(capacity, top_n):
+    """
+    MisraGries capacity for reporting the top_n words: at least 2 * top_n, so words
+    tied at the prune cutoff are ranked below the top N instead of removing them.
+    """
+    return max(capacity, 2 * top_n)
+
+def total_count(counter):
+    """
+    Number of tokens counted by a Counter or a MisraGries summary.
+    """
+    return counter.total if isinstance(counter, MisraGries) else sum(counter.values())
+
+def compare_with_exact(approx, exact, top_n):
+    """
+    Report how the approximate top-N words and counts match an exact Counter.
+    """
+    approx_top = approx.most_common(top_n)
+    exact_top = [word for word, _ in exact.most_common(top_n)]
+    overlap = len(set(word for word, _ in approx_top) & set(exact_top))
+    errors = [exact[word] - estimate for word, estimate in approx_top]
+    
+    print(f"Approximate vs exact top {top_n}:")
+    print(f"  Overlap: {overlap}/{len(exact_top)} words ({overlap / max(len(exact_top), 1):.1%})")
+    print(f"  Count error: max {max(errors, default=0)}, mean {sum(errors) / max(len(errors), 1):.1f} "
+          f"(bound {approx.error_bound})")
+    print(f"  Words tracked: {len(approx)} of {len(exact)} distinct")
+
+def plan_chunks(files, chunk_bytes):
+    """
+    Split the files into (path, start, end) byte ranges of about chunk_bytes each,
+    so one huge file is shared between workers instead of holding one of them up.
+    """
+    chunks = []
+    for file_path in files:
+        size = os.path.getsize(file_path)
+        for start in range(0, max(size, 1), chunk_bytes):
+            chunks.append((file_path, start, min(start + chunk_bytes, size)))
+    return chunks
+
+def count_tokens_in_chunk(chunk):
+    """
+    Worker: count the tokens of every line that starts inside the byte range.
+    A line that crosses the start belongs to the previous range, one that crosses
+    the end is read to completion, so every line is counted exactly once.
+    """
+    file_path, start, end = chunk
+    counter = Counter()
+    try:
+        with open(file_path, 'rb') as f:
+            if start > 0:
+                # Skip to the first line starting at or after start
+                f.seek(start - 1)
+                f.readline()
+            while f.tell() < end:
+                line = f.readline()
+                if not line:
+                    break
+                count_tokens_in_line(line.decode('utf-8', errors='replace'), counter)
     except Exception as e:
         print(f"Error processing {file_path}: {e}")
     
-    return tokens
+    return counter
+
+def count_tokens_in_parallel(files, workers, chunk_bytes=64 * 1024 * 1024, token_counter=None):
+    """
+    Count tokens over all files with a pool of worker processes, each returning a
+    Counter for one byte range, merged here as they finish.
+    """
+    chunks = plan_chunks(files, chunk_bytes)
+    print(f"Counting {len(chunks)} chunks with {workers} worker processes...")
+    if token_counter is None:
+        token_counter = Counter()
+    
+    with mp.Pool(workers) as pool:
+        for counter in tqdm(pool.imap_unordered(count_tokens_in_chunk, chunks), total=len(chunks)):
+            token_counter.update(counter)
+    
+    return token_counter
+
+def count_corpus(args, files, token_counter):
+    """
+    Count the corpus selected on the command line into token_counter.
+    """
+    if args.dump and args.dump_index and args.workers > 1:
+        count_dump_in_parallel(args.dump, args.dump_index, args.workers,
+                               args.chunk_mb * 1024 * 1024, token_counter)
+    elif args.dump:
+        if args.workers > 1:
+            print("A single-stream dump can only be decompressed serially; pass the multistream "
+                  "dump and its --dump-index to use --workers.")
+        count_dump(args.dump, token_counter)
+    elif args.cache:
+        count_files_cached(files, args.cache, token_counter, args.workers, args.chunk_mb * 1024 * 1024)
+    elif args.workers > 1:
+        count_tokens_in_parallel(files, args.workers, args.chunk_mb * 1024 * 1024, token_counter)
+    else:
+        # Process each file
+        for file_path in tqdm(files):
+            count_tokens_in_file(file_path, token_counter)
+    
+    return token_counter
 
 def main():
     parser = argparse.ArgumentParser(description='Extract common Yoruba words from text files')
@@ -87,12 +791,40 @@ def main():
                         help='Number of top words to extract')
     parser.add_argument('--fallback', action='store_true',
                         help='Use fallback list if no files found or words extracted')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of counting processes (1 counts in this process)')
+    parser.add_argument('--chunk-mb', type=int, default=64,
+                        help='Size of the byte ranges large files are split into for --workers')
+    parser.add_argument('--dump', type=str,
+                        help='Count a yowiki-*-pages-articles.xml.bz2 dump directly instead of --input-dir')
+    parser.add_argument('--dump-index', type=str,
+                        help='multistream-index.txt(.bz2) of a multistream --dump, to decompress it in parallel with --workers')
+    parser.add_argument('--approximate', type=int, default=0, metavar='CAPACITY',
+                        help='Count in bounded memory, tracking at most 2 x CAPACITY words (CAPACITY is at least 2 x --top-n)')
+    parser.add_argument('--compare-exact', action='store_true',
+                        help='With --approximate, count again exactly and report the top-N overlap and errors')
+    parser.add_argument('--cache', type=str,
+                        help='SQLite file of per-file counts; re-runs only tokenize new or changed files in --input-dir')
+    parser.add_argument('--frequency-output', type=str, default='yoruba_frequencies.bin',
+                        help="Binary table of every word's corpus count, for frequency-ranked search ('' to skip)")
+    parser.add_argument('--candidates-output', type=str,
+                        help='Also write distributional synonym candidates (PPMI + cosine) to this JSON file (needs scipy); '
+                             'see scripts/expand_massive_dictionary.py --candidates')
+    parser.add_argument('--vocab-size', type=int, default=20000,
+                        help='Number of most common words given co-occurrence vectors')
+    parser.add_argument('--window', type=int, default=5,
+                        help='Co-occurrence window in tokens on each side')
+    parser.add_argument('--candidates-k', type=int, default=10,
+                        help='Synonym candidates kept per word')
     
     args = parser.parse_args()
     
     # Find all the text files
     files = []
-    if os.path.exists(args.input_dir):
+    if args.dump:
+        if os.path.exists(args.dump):
+            files = [args.dump]
+    elif os.path.exists(args.input_dir):
         files = glob.glob(os.path.join(args.input_dir, '**', '*.json'), recursive=True)
         if not files:
             files = glob.glob(os.path.join(args.input_dir, '**', 'wiki_*'), recursive=True)
@@ -100,11 +832,12 @@ def main():
             files = glob.glob(os.path.join(args.input_dir, '**', '*.txt'), recursive=True)
     
     if not files:
-        print(f"No files found in {args.input_dir}")
+        print(f"No files found in {args.dump or args.input_dir}")
         if not args.fallback:
             print("To download and extract the Yoruba Wikipedia dump, run:")
             print("wget https://dumps.wikimedia.org/yowiki/latest/yowiki-latest-pages-articles.xml.bz2")
             print("python -m wikiextractor.WikiExtractor yowiki-latest-pages-articles.xml.bz2 --output extracted_wiki --json")
+            print("Or count the dump directly with --dump yowiki-latest-pages-articles.xml.bz2.")
             print("Or use the --fallback flag to generate a basic word list.")
             return
         else:
@@ -118,12 +851,10 @@ def main():
                 "ẹ̀mí", "ará", "ìmọ́", "ìṣe", "ẹlẹ́rìí", "ìjọba", "ìlera", "ìdàjọ́", "ìṣọ̀kan", "ìdàgbàsókè",
                 "ìrìn", "èdè", "ìṣẹ̀dálẹ̀", "gbogbo", "kékeré", "púpọ̀", "díẹ̀", "tó", "jù"
             ]
-            if len(fallback_words) < args.top_n:
-                # Duplicate words to reach desired count
-                multiplier = (args.top_n + len(fallback_words) - 1) // len(fallback_words)
-                fallback_words = fallback_words * multiplier
-            
-            top_words = fallback_words[:args.top_n]
+            # Unique words only - repeating the list would just pay for duplicate generations
+            top_words = list(dict.fromkeys(fallback_words))[:args.top_n]
+            if len(top_words) < args.top_n:
+                print(f"Warning: the fallback list only has {len(top_words)} unique words, fewer than requested {args.top_n}")
             
             # Save to JSON
             with open(args.output, 'w', encoding='utf-8') as f:
@@ -133,12 +864,33 @@ def main():
             return
     
     print(f"Processing {len(files)} files...")
-    token_counter = Counter()
+    start_time = time.time()
+    if args.approximate:
+        token_counter = count_corpus(args, files, MisraGries(summary_capacity(args.approximate, args.top_n)))
+    else:
+        token_counter = count_corpus(args, files, Counter())
+    
+    elapsed = time.time() - start_time
+    total_words = total_count(token_counter)
+    rate = total_words / elapsed if elapsed > 0 else 0
+    print(f"Counted {total_words} words ({len(token_counter)} {'tracked' if args.approximate else 'distinct'}) in {elapsed:.1f} seconds "
+          f"({rate:.0f} words/sec)")
+    peak = peak_rss_mb()
+    if peak is not None:
+        print(f"Peak RSS: {peak:.1f} MB")
+    
+    if args.approximate:
+        print(f"Approximate counts undercount by at most {token_counter.error_bound} "
+              f"({token_counter.error_bound / max(total_words, 1):.4%} of all words)")
+        if args.compare_exact:
+            print("Counting again exactly for comparison...")
+            compare_with_exact(token_counter, count_corpus(args, files, Counter()), args.top_n)
     
-    # Process each file
-    for file_path in tqdm(files):
-        tokens = extract_tokens_from_file(file_path)
-        token_counter.update(tokens)
+    if args.frequency_output:
+        counts = token_counter.counts if isinstance(token_counter, MisraGries) else token_counter
+        write_frequency_table(counts, args.frequency_output)
+        print(f"Saved frequencies of {len(counts)} words to {args.frequency_output} "
+              f"({os.path.getsize(args.frequency_output) / (1024 * 1024):.1f} MB)")
     
     # Get the top N most common words
     top_words = [word for word, _ in token_counter.most_common(args.top_n)]
@@ -164,6 +916,14 @@ def main():
     if len(top_words) < args.top_n:
         print(f"Warning: Only found {len(top_words)} words, fewer than requested {args.top_n}")
         print("Consider using the --fallback flag to supplement with basic words.")
+    
+    if args.candidates_output:
+        vocabulary = [word for word, _ in token_counter.most_common(args.vocab_size)]
+        if len(vocabulary) < 2:
+            print("Not enough words to compute synonym candidates.")
+            return
+        build_synonym_candidates(files, args.dump, vocabulary, args.candidates_output,
+                                 args.window, args.candidates_k)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+hybrid_search.py - Hybrid lexical + semantic search for the Yoruba synonym finder
+"""
+
+import json
+import difflib
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+# Constant from the reciprocal rank fusion paper; damps the weight of the top few ranks
+RRF_K = 60
+
+# Shared pool for running the fuzzy and semantic searches side by side
+_executor = ThreadPoolExecutor(max_workers=2)
+
+def normalize_word(word):
+    """
+    Normalize a Yoruba word for matching: lowercase and strip whitespace.
+    """
+    return word.lower().strip()
+
+def load_dictionary(dict_file):
+    """
+    Load a headword -> entry dictionary from a JSON file.
+    """
+    try:
+        with open(dict_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Dictionary file {dict_file} not found.")
+    except json.JSONDecodeError:
+        raise ValueError(f"Dictionary file {dict_file} contains invalid JSON.")
+
+def build_synonym_index(dictionary):
+    """
+    Map every normalized synonym to the headwords that list it, so synonym
+    lookups are a single dict access instead of a scan over the dictionary.
+    """
+    synonym_index = {}
+    for headword, entry in dictionary.items():
+        for synonym in entry.get("synonyms", []):
+            headwords = synonym_index.setdefault(normalize_word(synonym), [])
+            if headword not in headwords:
+                headwords.append(headword)
+    return synonym_index
+
+def lexical_lookup(query, dictionary, synonym_index, max_results=3):
+    """
+    O(1) exact headword and synonym lookup. Returns an empty list on a miss.
+    """
+    query = normalize_word(query)
+    
+    # Direct match - check if word exists directly in the dictionary
+    if query in dictionary:
+        return [{"rank": 1, "similarity": 1.0, "entry": dictionary[query], "source": "exact"}]
+    
+    # Synonym match - the query is listed as a synonym of one or more headwords
+    results = []
+    for i, headword in enumerate(synonym_index.get(query, [])[:max_results]):
+        results.append({
+            "rank": i + 1,
+            "similarity": 1.0,
+            "entry": dictionary[headword],
+            "source": "synonym"
+        })
+    
+    return results
+
+def sample_keys(dict_keys):
+    """
+    Headwords to fuzzy-match against. Large dictionaries are sampled to keep
+    difflib fast: the first 500 headwords plus 2500 random ones.
+    """
+    if len(dict_keys) > 10000:
+        return dict_keys[:500] + random.sample(dict_keys[500:], min(2500, len(dict_keys) - 500))
+    return dict_keys
+
+def fuzzy_search(query, dictionary, max_results=3):
+    """
+    Find the headwords closest in spelling to the query using difflib.
+    """
+    query = normalize_word(query)
+    matches = difflib.get_close_matches(query, sample_keys(list(dictionary.keys())), n=max_results, cutoff=0.6)
+    
+    results = []
+    for i, match in enumerate(matches):
+        results.append({
+            "rank": i + 1,
+            "similarity": difflib.SequenceMatcher(None, query, match).ratio(),
+            "entry": dictionary[match],
+            "source": "fuzzy"
+        })
+    
+    return results
+
+def reciprocal_rank_fusion(result_lists, max_results=3, k=RRF_K):
+    """
+    Merge ranked result lists by summing 1 / (k + rank) per headword.
+    Scores are scaled so that being ranked first in every list gives 1.0.
+    """
+    scores = {}
+    entries = {}
+    sources = {}
+    
+    for results in result_lists:
+        for result in results:
+            key = normalize_word(result["entry"]["headword"])
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + result["rank"])
+            # Keep the first entry seen, so dictionary entries win over index copies
+            entries.setdefault(key, result["entry"])
+            sources.setdefault(key, []).append(result["source"])
+    
+    best_possible = len(result_lists) / (k + 1) if result_lists else 1.0
+    ranked = sorted(scores, key=scores.get, reverse=True)[:max_results]
+    
+    return [
+        {
+            "rank": i + 1,
+            "similarity": scores[key] / best_possible,
+            "entry": entries[key],
+            "source": "+".join(sources[key])
+        }
+        for i, key in enumerate(ranked)
+    ]
+
+def hybrid_search(query, dictionary, synonym_index, semantic_search=None, max_results=3):
+    """
+    Search lexically first and only fall back to fuzzy + semantic search on a miss.
+    
+    semantic_search is a callable taking (query, top_k) and returning results in the
+    query.py format ({"rank", "similarity", "entry"}). When it is None only the
+    lexical engines are used.
+    """
+    results = lexical_lookup(query, dictionary, synonym_index, max_results)
+    if results:
+        return results
+    
+    # Miss - run the fuzzy and semantic searches concurrently
+    fuzzy_future = _executor.submit(fuzzy_search, query, dictionary, max_results)
+    semantic_future = None
+    if semantic_search is not None:
+        semantic_future = _executor.submit(semantic_search, query, max_results)
+    
+    result_lists = [fuzzy_future.result()]
+    if semantic_future is not None:
+        semantic_results = [dict(result, source="semantic") for result in semantic_future.result()]
+        result_lists.append(semantic_results)
+    
+    # Drop engines that found nothing so they don't dilute the fused scores
+    result_lists = [results for results in result_lists if results]
+    
+    return reciprocal_rank_fusion(result_lists, max_results)
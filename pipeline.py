@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+pipeline.py - Generate, parse and index Yoruba entries in one streaming pass
+"""
+
+import os
+import json
+import time
+import argparse
+import numpy as np
+import faiss
+
+from generate_entries import (load_model_and_tokenizer, load_common_words, dedupe_words,
+                              choose_batch_size, iter_generated_batches, new_generation_stats,
+                              report_generation_rate, write_generation_stats, PROMPT_STYLES)
+from build_index import (Encoder, IndexBuilder, MetadataWriter, encode_chunk, field_index_path,
+                         build_knn_table, report_index, FIELD_SLUGS, INDEX_TYPES)
+
+def write_model_info(model_name, field_files, knn_file=None):
+    """
+    Record the embedding model and extra files for query.py.
+    """
+    model_info = {"name": model_name, "fields": field_files, "knn": knn_file}
+    with open("model_info.json", "w") as f:
+        json.dump(model_info, f)
+
+class StreamingIndexer:
+    """
+    Embed entries and add them to the indexes as they arrive, writing a queryable
+    snapshot of the indexes every checkpoint_interval seconds.
+    """
+    
+    def __init__(self, encoder, metadata, index_file, fields=(), index_type='flat', pq_m=48,
+                 pq_bits=8, train_size=50000, chunk_size=256, checkpoint_interval=60):
+        self.encoder = encoder
+        self.metadata = metadata
+        self.index_file = index_file
+        self.fields = tuple(fields)
+        self.chunk_size = chunk_size
+        self.checkpoint_interval = checkpoint_interval
+        self.builders = {
+            field: IndexBuilder(encoder.dimension, index_type, pq_m, pq_bits, train_size)
+            for field in ('headword',) + self.fields
+        }
+        self.pending = []
+        self.last_checkpoint = time.time()
+        self.checkpoints = 0
+    
+    def add(self, entries):
+        """
+        Buffer entries and index them once a full chunk has arrived.
+        """
+        self.pending.extend(entries)
+        while len(self.pending) >= self.chunk_size:
+            chunk, self.pending = self.pending[:self.chunk_size], self.pending[self.chunk_size:]
+            self._index_chunk(chunk)
+        
+        if time.time() - self.last_checkpoint >= self.checkpoint_interval:
+            self.checkpoint()
+    
+    def _index_chunk(self, chunk):
+        embeddings = encode_chunk(self.encoder, chunk, self.fields)
+        for i, builder in enumerate(self.builders.values()):
+            builder.add(embeddings[i * len(chunk):(i + 1) * len(chunk)])
+        self.metadata.write(chunk)
+    
+    def field_files(self):
+        return {field: field_index_path(self.index_file, field) for field in self.fields}
+    
+    def checkpoint(self):
+        """
+        Save the indexes so query.py can search everything indexed so far.
+        Indexes that are still buffering their training vectors are skipped.
+        """
+        self.last_checkpoint = time.time()
+        index = self.builders['headword'].index
+        if not index.is_trained or index.ntotal == 0:
+            return
+        
+        # Write every index to a temporary file first, then swap the indexes and the
+        # metadata in together, so readers never pair an index with other metadata
+        staged = [(index, self.index_file)]
+        staged += [(self.builders[field].index, path) for field, path in self.field_files().items()]
+        for field_index, path in staged:
+            faiss.write_index(field_index, path + '.tmp')
+        if self.checkpoints == 0:
+            # The previous run's neighbour table and field indexes don't match the new index
+            write_model_info(self.encoder.model_name, {})
+        self.metadata.commit()
+        for _, path in staged:
+            os.replace(path + '.tmp', path)
+        if self.checkpoints == 0:
+            # Point query.py at the new field indexes once they exist
+            write_model_info(self.encoder.model_name, self.field_files())
+        self.checkpoints += 1
+        print(f"Checkpoint {self.checkpoints}: {index.ntotal} entries searchable in {self.index_file}")
+    
+    def finish(self):
+        """
+        Index any leftover entries, train indexes that never filled their buffer and
+        save the final indexes.
+        """
+        if self.pending:
+            self._index_chunk(self.pending)
+            self.pending = []
+        for builder in self.builders.values():
+            builder.finish()
+        self.checkpoint()
+        return self.builders['headword'].index
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Generate Yoruba entries and index them as they are produced'
+    )
+    parser.add_argument('--input', type=str, default='common_200.json',
+                        help='Input JSON file with common words')
+    parser.add_argument('--generator-model', type=str, default='google/mt5-small',
+                        help='Transformer model used to generate entries')
+    parser.add_argument('--embedding-model', type=str, default='all-MiniLM-L6-v2',
+                        help='Sentence transformer model used to embed entries')
+    parser.add_argument('--batch-size', type=int, default=None,
+                        help='Words per generate call (default: chosen from available memory)')
+    parser.add_argument('--quantize', action='store_true',
+                        help='Run the generator with int8 dynamically-quantized linear layers on CPU')
+    parser.add_argument('--prompt-style', type=str, default='few-shot', choices=PROMPT_STYLES,
+                        help='Prompt style passed to the generator (see generate_entries.py)')
+    parser.add_argument('--words-per-prompt', type=int, default=5,
+                        help='Words per prompt with --prompt-style packed')
+    parser.add_argument('--encode-batch-size', type=int, default=32,
+                        help='Number of texts per encoder batch')
+    parser.add_argument('--chunk-size', type=int, default=256,
+                        help='Generated entries embedded and indexed at a time')
+    parser.add_argument('--checkpoint-interval', type=float, default=60,
+                        help='Seconds between saving a queryable snapshot of the index')
+    parser.add_argument('--index-output', type=str, default='yoruba_index.faiss',
+                        help='Output FAISS index file')
+    parser.add_argument('--headwords-output', type=str, default='yoruba_texts.txt',
+                        help='Output text file for headwords, one per line')
+    parser.add_argument('--entries-output', type=str, default='yoruba_entries.jsonl',
+                        help='Output JSONL file for full entries')
+    parser.add_argument('--index-type', type=str, default='flat', choices=INDEX_TYPES,
+                        help='Vector storage (int8 and pq only become searchable once trained)')
+    parser.add_argument('--pq-m', type=int, default=48,
+                        help='Number of PQ sub-quantizers (must divide the embedding dimension)')
+    parser.add_argument('--pq-bits', type=int, default=8,
+                        help='Bits per PQ sub-quantizer code')
+    parser.add_argument('--train-size', type=int, default=50000,
+                        help='Vectors buffered to train int8 and PQ indexes before adding incrementally')
+    parser.add_argument('--fields', type=str, default='',
+                        help=f"Comma-separated entry fields to index alongside the headword ({', '.join(FIELD_SLUGS)})")
+    parser.add_argument('--knn-k', type=int, default=10,
+                        help='Neighbours to precompute per headword once generation is done (0 to skip)')
+    parser.add_argument('--knn-output', type=str, default='yoruba_knn.npz',
+                        help='Output NumPy file for the precomputed neighbour table')
+    parser.add_argument('--stats-output', type=str, default='generation_stats.json',
+                        help='JSON file for batch latency, token throughput and fallback counts')
+    
+    args = parser.parse_args()
+    
+    fields = [field.strip() for field in args.fields.split(',') if field.strip()]
+    for field in fields:
+        if field not in FIELD_SLUGS:
+            raise ValueError(f"Unknown field {field}. Choose from: {', '.join(FIELD_SLUGS)}")
+    
+    print(f"Loading common Yoruba words from {args.input}...")
+    words = dedupe_words(load_common_words(args.input))
+    
+    model, tokenizer = load_model_and_tokenizer(args.generator_model, args.quantize)
+    batch_size = args.batch_size or choose_batch_size(model)
+    encoder = Encoder(args.embedding_model, batch_size=args.encode_batch_size)
+    # Rows go to temporary files until the first checkpoint, so the previous index
+    # stays searchable with its own metadata until then
+    metadata = MetadataWriter(args.headwords_output, args.entries_output, atomic=True)
+    indexer = StreamingIndexer(encoder, metadata, args.index_output, fields, args.index_type,
+                               args.pq_m, args.pq_bits, args.train_size, args.chunk_size,
+                               args.checkpoint_interval)
+    
+    print(f"Generating and indexing entries for {len(words)} words in batches of {batch_size}...")
+    stats = new_generation_stats()
+    start_time = time.time()
+    try:
+        for entries in iter_generated_batches(model, tokenizer, words, batch_size, stats,
+                                              prompt_style=args.prompt_style,
+                                              words_per_prompt=args.words_per_prompt):
+            stats["entries"] += len(entries)
+            indexer.add(entries)
+        index = indexer.finish()
+    except BaseException:
+        metadata.discard()
+        raise
+    finally:
+        metadata.close()
+        encoder.close()
+    
+    stats["seconds"] = time.time() - start_time
+    report_generation_rate(stats, stats["seconds"])
+    encoder.report_throughput()
+    print(f"Indexed {metadata.count} entries")
+    
+    if index.ntotal == 0:
+        # No checkpoint was written, so the previous index is still in place
+        metadata.discard()
+        write_generation_stats(stats, args.stats_output)
+        print("No entries were indexed; the existing index files were left unchanged.")
+        return
+    report_index(index, args.index_output)
+    
+    knn_file = None
+    if args.knn_k > 0 and index.ntotal > 0:
+        print(f"Precomputing {args.knn_k} nearest neighbours per headword...")
+        knn_ids, knn_scores = build_knn_table(index, args.knn_k)
+        knn_file = args.knn_output
+        print(f"Saving neighbour table to {knn_file}...")
+        np.savez(knn_file, ids=knn_ids, scores=knn_scores)
+    write_model_info(args.embedding_model, indexer.field_files(), knn_file)
+    
+    write_generation_stats(stats, args.stats_output)
+    print("Pipeline complete! You can now query the index using query.py.")
+
+if __name__ == "__main__":
+    main()
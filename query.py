@@ -6,12 +6,179 @@ query.py - CLI tool for querying the Yoruba synonym finder
 """
 
 import json
+import sys
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import faiss
-from sentence_transformers import SentenceTransformer
 import argparse
 
-def load_resources(index_file, texts_file, entries_file, model_name=None):
+from hybrid_search import load_dictionary, build_synonym_index, hybrid_search, normalize_word
+
+# Searches the headword and field indexes side by side for "by meaning" queries
+_field_executor = ThreadPoolExecutor(max_workers=4)
+
+def get_model_name():
+    """
+    Read the model name recorded by build_index.py, falling back to the default.
+    """
+    try:
+        with open("model_info.json", "r") as f:
+            model_info = json.load(f)
+            return model_info.get("name", "all-MiniLM-L6-v2")
+    except (FileNotFoundError, json.JSONDecodeError):
+        return "all-MiniLM-L6-v2"
+
+def load_field_indexes():
+    """
+    Load the extra field indexes (definition, examples) recorded by build_index.py.
+    """
+    try:
+        with open("model_info.json", "r") as f:
+            field_files = json.load(f).get("fields", {})
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    
+    return {field: faiss.read_index(path) for field, path in field_files.items()}
+
+def load_metadata(path):
+    """
+    Load the headwords (.txt, one per line) or entries (.jsonl) written by
+    build_index.py. Older .npy files are still accepted.
+    """
+    if path.endswith('.npy'):
+        return np.load(path, allow_pickle=True)
+    
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = f.readlines()
+    
+    # pipeline.py may be appending to the file; ignore a last line it hasn't finished
+    if lines and not lines[-1].endswith('\n'):
+        lines.pop()
+    
+    if path.endswith('.jsonl'):
+        return [json.loads(line) for line in lines if line.strip()]
+    return [line.rstrip('\n') for line in lines]
+
+class NeighbourTable:
+    """
+    Precomputed nearest neighbours of every indexed headword (build_index.py --knn-k),
+    so queries for known headwords need neither the model nor FAISS.
+    """
+    
+    def __init__(self, ids, scores, headwords):
+        self.ids = ids
+        self.scores = scores
+        self.rows = {}
+        for row, headword in enumerate(headwords):
+            self.rows.setdefault(normalize_word(str(headword)), row)
+    
+    def lookup(self, query, entries, top_k=3):
+        """
+        Return results for a known headword, or None if the query must be encoded.
+        """
+        row = self.rows.get(normalize_word(query))
+        if row is None or top_k > self.ids.shape[1]:
+            return None
+        
+        results = []
+        for i in range(top_k):
+            idx = self.ids[row, i]
+            if 0 <= idx < len(entries):
+                results.append({
+                    "rank": i + 1,
+                    "similarity": float(self.scores[row, i]),
+                    "entry": entries[idx]
+                })
+        return results
+
+def load_neighbour_table(headwords):
+    """
+    Load the neighbour table recorded in model_info.json, or None if there isn't one.
+    """
+    try:
+        with open("model_info.json", "r") as f:
+            knn_file = json.load(f).get("knn")
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    
+    if not knn_file:
+        return None
+    
+    try:
+        table = np.load(knn_file)
+    except FileNotFoundError:
+        return None
+    
+    return NeighbourTable(table["ids"], table["scores"], headwords)
+
+def quantize_model(model):
+    """
+    Return a copy of the model with its linear layers dynamically quantized to int8.
+    """
+    import torch
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def load_model(model_name, quantize=False):
+    """
+    Load the sentence transformer, optionally as an int8-quantized CPU model.
+    """
+    # Imported here so torch is only loaded once a query needs embeddings
+    from sentence_transformers import SentenceTransformer
+    
+    if not quantize:
+        return SentenceTransformer(model_name)
+    
+    # Dynamic quantization only runs on CPU
+    model = SentenceTransformer(model_name, device='cpu')
+    return quantize_model(model)
+
+class LazyModel:
+    """
+    Stand-in for the sentence transformer that defers importing torch and
+    sentence-transformers, and loading the model, until the first encode.
+    """
+    
+    def __init__(self, model_name, quantize=False):
+        self.model_name = model_name
+        self.quantize = quantize
+        self.model = None
+        self.lock = threading.Lock()
+        self.first_result_seconds = None
+    
+    @property
+    def loaded(self):
+        return self.model is not None
+    
+    def get(self):
+        """
+        Return the underlying model, loading it on first use.
+        """
+        with self.lock:
+            if self.model is None:
+                start_time = time.time()
+                self.model = load_model(self.model_name, quantize=self.quantize)
+                print(f"Loaded model {self.model_name} in {time.time() - start_time:.2f} seconds",
+                      file=sys.stderr)
+            return self.model
+    
+    def encode(self, *args, **kwargs):
+        return self.get().encode(*args, **kwargs)
+    
+    def report_first_result(self, seconds):
+        """
+        Print how long the first search took, and whether it had to load the model.
+        Later searches are not reported.
+        """
+        if self.first_result_seconds is not None:
+            return
+        self.first_result_seconds = seconds
+        how = "including model load" if self.loaded else "model not loaded"
+        print(f"Time to first result: {seconds:.2f} seconds ({how})", file=sys.stderr)
+
+def load_resources(index_file, texts_file, entries_file, model_name=None, quantize=False):
     """
     Load the FAISS index, headwords, entries, and initialize the model.
     """
@@ -20,22 +187,17 @@ def load_resources(index_file, texts_file, entries_file, model_name=None):
         index = faiss.read_index(index_file)
         
         # Load the headwords
-        headwords = np.load(texts_file, allow_pickle=True)
+        headwords = load_metadata(texts_file)
         
         # Load the entries
-        entries = np.load(entries_file, allow_pickle=True)
+        entries = load_metadata(entries_file)
         
         # Get model name if not provided
         if not model_name:
-            try:
-                with open("model_info.json", "r") as f:
-                    model_info = json.load(f)
-                    model_name = model_info.get("name", "all-MiniLM-L6-v2")
-            except (FileNotFoundError, json.JSONDecodeError):
-                model_name = "all-MiniLM-L6-v2"
+            model_name = get_model_name()
         
-        # Load the model
-        model = SentenceTransformer(model_name)
+        # The model is only loaded when a query actually needs embeddings
+        model = LazyModel(model_name, quantize=quantize)
         
         return index, headwords, entries, model
     except FileNotFoundError as e:
@@ -43,16 +205,92 @@ def load_resources(index_file, texts_file, entries_file, model_name=None):
         print("Make sure you've run build_index.py first to create the necessary files.")
         exit(1)
 
-def search_synonyms(query, index, headwords, entries, model, top_k=3):
+class QueryEmbeddingCache:
     """
-    Search for synonyms of the given query word.
+    Bounded LRU cache mapping normalized query strings to normalized embeddings.
     """
+    
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self.embeddings = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # The Streamlit app shares one cache across sessions
+        self.lock = threading.Lock()
+    
+    def get(self, key):
+        """
+        Return the cached embedding for key, or None, and record the hit or miss.
+        """
+        with self.lock:
+            embedding = self.embeddings.get(key)
+            if embedding is None:
+                self.misses += 1
+                return None
+            self.embeddings.move_to_end(key)
+            self.hits += 1
+            return embedding
+    
+    def put(self, key, embedding):
+        """
+        Store an embedding, evicting the least recently used one when full.
+        """
+        with self.lock:
+            self.embeddings[key] = embedding
+            self.embeddings.move_to_end(key)
+            while len(self.embeddings) > self.max_size:
+                self.embeddings.popitem(last=False)
+    
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+    
+    def __len__(self):
+        return len(self.embeddings)
+
+def embed_query(query, model, cache=None):
+    """
+    Encode the normalized query into a normalized float32 row vector,
+    going through the cache when one is given.
+    """
+    key = normalize_word(query)
+    
+    if cache is not None:
+        query_embedding = cache.get(key)
+        if query_embedding is not None:
+            return query_embedding
+    
     # Encode the query
-    query_embedding = model.encode([query], convert_to_numpy=True)
+    query_embedding = model.encode([key], convert_to_numpy=True).astype('float32')
     
     # Normalize the query embedding for cosine similarity
     faiss.normalize_L2(query_embedding)
     
+    if cache is not None:
+        cache.put(key, query_embedding)
+    
+    return query_embedding
+
+def search_synonyms(query, index, headwords, entries, model, top_k=3, cache=None, neighbours=None):
+    """
+    Search for synonyms of the given query word.
+    """
+    start_time = time.time()
+    results = _search_synonyms(query, index, entries, model, top_k, cache, neighbours)
+    if isinstance(model, LazyModel):
+        model.report_first_result(time.time() - start_time)
+    return results
+
+def _search_synonyms(query, index, entries, model, top_k, cache, neighbours):
+    # Known headwords are answered straight from the precomputed neighbour table
+    if neighbours is not None:
+        results = neighbours.lookup(query, entries, top_k)
+        if results is not None:
+            return results
+    
+    query_embedding = embed_query(query, model, cache)
+    
     # Search the index
     distances, indices = index.search(query_embedding, top_k)
     
@@ -69,6 +307,202 @@ def search_synonyms(query, index, headwords, entries, model, top_k=3):
     
     return results
 
+def search_by_meaning(query, index, field_indexes, entries, model, top_k=3, cache=None):
+    """
+    Search the headword index and every field index with a single query embedding
+    and merge the hits per entry, keeping each entry's best-scoring field.
+    """
+    start_time = time.time()
+    query_embedding = embed_query(query, model, cache)
+    
+    indexes = {"headword": index}
+    indexes.update(field_indexes)
+    
+    # One encode, then the index searches run concurrently
+    futures = {
+        field: _field_executor.submit(field_index.search, query_embedding, top_k)
+        for field, field_index in indexes.items()
+    }
+    
+    best = {}
+    for field, future in futures.items():
+        distances, indices = future.result()
+        for similarity, idx in zip(distances[0], indices[0]):
+            if 0 <= idx < len(entries) and (idx not in best or similarity > best[idx][0]):
+                best[idx] = (float(similarity), field)
+    
+    ranked = sorted(best.items(), key=lambda item: item[1][0], reverse=True)[:top_k]
+    
+    results = [
+        {
+            "rank": i + 1,
+            "similarity": similarity,
+            "entry": entries[idx],
+            "field": field
+        }
+        for i, (idx, (similarity, field)) in enumerate(ranked)
+    ]
+    if isinstance(model, LazyModel):
+        model.report_first_result(time.time() - start_time)
+    return results
+
+def iter_query_batches(stream, batch_size):
+    """
+    Read one query per line from a stream and yield them in lists of batch_size.
+    """
+    batch = []
+    for line in stream:
+        query = line.strip()
+        if not query:
+            continue
+        batch.append(query)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    
+    if batch:
+        yield batch
+
+def search_batch(queries, index, entries, model, top_k=3, neighbours=None):
+    """
+    Encode a batch of queries together and search the index with the whole query matrix.
+    Queries for known headwords are answered from the neighbour table without encoding.
+    """
+    answered = {}
+    if neighbours is not None:
+        for i, query in enumerate(queries):
+            results = neighbours.lookup(query, entries, top_k)
+            if results is not None:
+                answered[i] = results
+    
+    to_encode = [query for i, query in enumerate(queries) if i not in answered]
+    searched = iter(())
+    if to_encode:
+        query_embeddings = model.encode(
+            [normalize_word(query) for query in to_encode], batch_size=256, convert_to_numpy=True
+        ).astype('float32')
+        faiss.normalize_L2(query_embeddings)
+        distances, indices = index.search(query_embeddings, top_k)
+        searched = zip(distances, indices)
+    
+    for i, query in enumerate(queries):
+        if i in answered:
+            yield query, answered[i]
+            continue
+        
+        row_distances, row_indices = next(searched)
+        results = []
+        for rank, idx in enumerate(row_indices):
+            if 0 <= idx < len(entries):
+                results.append({
+                    "rank": rank + 1,
+                    "similarity": float(row_distances[rank]),
+                    "entry": entries[idx]
+                })
+        yield query, results
+
+def run_batch_queries(query_file, index, entries, model, top_k=3, batch_size=1024, output=None,
+                      neighbours=None):
+    """
+    Stream JSONL results for every query in query_file ('-' reads stdin).
+    """
+    output = output or sys.stdout
+    stream = sys.stdin if query_file == '-' else open(query_file, 'r', encoding='utf-8')
+    
+    start_time = time.time()
+    total = 0
+    try:
+        for batch in iter_query_batches(stream, batch_size):
+            for query, results in search_batch(batch, index, entries, model, top_k, neighbours):
+                output.write(json.dumps({"query": query, "results": results}, ensure_ascii=False) + '\n')
+            output.flush()
+            total += len(batch)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    
+    # Report on stderr so stdout stays pure JSONL
+    elapsed = time.time() - start_time
+    rate = total / elapsed if elapsed > 0 else 0
+    print(f"Processed {total} queries in {elapsed:.2f} seconds ({rate:.1f} queries/sec)", file=sys.stderr)
+    
+    return total
+
+def make_searcher(index, headwords, entries, model, cache=None, dictionary_file=None,
+                  field_indexes=None, neighbours=None):
+    """
+    Return a function mapping a query to results. With a dictionary file the
+    search is hybrid: lexical lookups first, fused fuzzy + semantic search on a miss.
+    With field indexes the semantic search also matches definitions and examples.
+    """
+    def semantic_search(query, top_k=3):
+        if field_indexes:
+            return search_by_meaning(query, index, field_indexes, entries, model, top_k=top_k, cache=cache)
+        return search_synonyms(query, index, headwords, entries, model, top_k=top_k, cache=cache,
+                               neighbours=neighbours)
+    
+    if not dictionary_file:
+        return semantic_search
+    
+    dictionary = load_dictionary(dictionary_file)
+    synonym_index = build_synonym_index(dictionary)
+    
+    def search(query, top_k=3):
+        return hybrid_search(query, dictionary, synonym_index, semantic_search, max_results=top_k)
+    
+    return search
+
+def compare_quantized(index, headwords, model_name, top_k=10, sample_size=200):
+    """
+    Compare the int8-quantized encoder against the float model: embedding parity,
+    search recall against the float results, and per-query encoding latency.
+    """
+    from sentence_transformers import SentenceTransformer
+    
+    # Both models on CPU, where the quantized one has to run
+    float_model = SentenceTransformer(model_name, device='cpu')
+    quantized_model = quantize_model(float_model)
+    
+    sample = [str(h) for h in headwords[:sample_size]]
+    if not sample:
+        print("No headwords to compare.")
+        return
+    
+    def encode_all(model):
+        embeddings = model.encode(sample, convert_to_numpy=True).astype('float32')
+        faiss.normalize_L2(embeddings)
+        return embeddings
+    
+    def time_per_query(model):
+        # Encode one text at a time, the way interactive queries arrive
+        model.encode(sample[:1], convert_to_numpy=True)
+        start_time = time.time()
+        for text in sample:
+            model.encode([text], convert_to_numpy=True)
+        return (time.time() - start_time) / len(sample) * 1000
+    
+    float_embeddings = encode_all(float_model)
+    quantized_embeddings = encode_all(quantized_model)
+    cosines = np.sum(float_embeddings * quantized_embeddings, axis=1)
+    
+    _, float_ids = index.search(float_embeddings, top_k)
+    _, quantized_ids = index.search(quantized_embeddings, top_k)
+    overlap = [
+        len(set(f) & set(q)) / top_k
+        for f, q in zip(float_ids.tolist(), quantized_ids.tolist())
+    ]
+    
+    float_ms = time_per_query(float_model)
+    quantized_ms = time_per_query(quantized_model)
+    
+    print("\n" + "="*60)
+    print(f"Quantized encoder comparison ({len(sample)} headwords, model {model_name})")
+    print(f"Embedding cosine vs float: mean {cosines.mean():.4f}, min {cosines.min():.4f}")
+    print(f"Recall@{top_k} vs float search: {np.mean(overlap):.4f}")
+    print(f"Latency per query: float {float_ms:.2f} ms, int8 {quantized_ms:.2f} ms "
+          f"({float_ms / quantized_ms:.2f}x)")
+    print("="*60)
+
 def display_results(results):
     """
     Display the search results in a readable format.
@@ -83,6 +517,8 @@ def display_results(results):
         similarity = result["similarity"]
         
         print(f"Rank {result['rank']} (similarity: {similarity:.4f})")
+        if result.get("field"):
+            print(f"Matched on: {result['field']}")
         print(f"Headword: {entry['headword']} ({entry['pos']})")
         print(f"Synonyms: {', '.join(entry['synonyms'])}")
         print(f"Definition: {entry['definition']}")
@@ -90,14 +526,22 @@ def display_results(results):
         print(f"Example (English): {entry['example']['en']}")
         print("-"*60)
 
-def interactive_search(index_file, texts_file, entries_file, model_name=None):
+def interactive_search(index_file, texts_file, entries_file, model_name=None, quantize=False,
+                       cache_size=10000, dictionary_file=None, by_meaning=False):
     """
     Run an interactive search loop.
     """
     print("Loading resources... This might take a moment.")
-    index, headwords, entries, model = load_resources(index_file, texts_file, entries_file, model_name)
+    index, headwords, entries, model = load_resources(
+        index_file, texts_file, entries_file, model_name, quantize=quantize
+    )
     print("Resources loaded!")
     
+    cache = QueryEmbeddingCache(cache_size)
+    field_indexes = load_field_indexes() if by_meaning else None
+    search = make_searcher(index, headwords, entries, model, cache, dictionary_file, field_indexes,
+                           load_neighbour_table(headwords))
+    
     print("\nYorùbá Synonym Finder")
     print("="*60)
     print("Type 'q' or 'quit' to exit.")
@@ -107,6 +551,7 @@ def interactive_search(index_file, texts_file, entries_file, model_name=None):
         query = query.strip()
         
         if query.lower() in ('q', 'quit', 'exit'):
+            print(f"Query cache: {cache.hits} hits, {cache.misses} misses ({cache.hit_rate:.1%} hit rate)")
             print("Goodbye!")
             break
         
@@ -115,36 +560,91 @@ def interactive_search(index_file, texts_file, entries_file, model_name=None):
             continue
         
         try:
-            results = search_synonyms(query, index, headwords, entries, model)
+            results = search(query)
             display_results(results)
         except Exception as e:
             print(f"Error: {e}")
 
 def main():
+    start_time = time.time()
     parser = argparse.ArgumentParser(description='Query the Yoruba synonym finder')
     parser.add_argument('--index', type=str, default='yoruba_index.faiss',
                         help='Path to the FAISS index file')
-    parser.add_argument('--headwords', type=str, default='yoruba_texts.npy',
-                        help='Path to the headwords NumPy file')
-    parser.add_argument('--entries', type=str, default='yoruba_entries.npy',
-                        help='Path to the entries NumPy file')
+    parser.add_argument('--headwords', type=str, default='yoruba_texts.txt',
+                        help='Path to the headwords file')
+    parser.add_argument('--entries', type=str, default='yoruba_entries.jsonl',
+                        help='Path to the entries JSONL file')
     parser.add_argument('--model', type=str, default=None,
                         help='Sentence transformer model name (optional)')
     parser.add_argument('--query', type=str,
                         help='Single query to run (optional, otherwise interactive mode)')
+    parser.add_argument('--by-meaning', action='store_true',
+                        help='Also match the query against definitions and examples indexed with build_index.py --fields')
+    parser.add_argument('--query-file', type=str,
+                        help="File with one query per line ('-' for stdin); results are written as JSONL")
+    parser.add_argument('--output', type=str,
+                        help='Output JSONL file for --query-file (default: stdout)')
+    parser.add_argument('--batch-size', type=int, default=1024,
+                        help='Number of queries encoded and searched together in --query-file mode')
+    parser.add_argument('--top-k', type=int, default=3,
+                        help='Number of results per query')
+    parser.add_argument('--quantize', action='store_true',
+                        help='Encode queries with an int8-quantized CPU model')
+    parser.add_argument('--cache-size', type=int, default=10000,
+                        help='Number of query embeddings to keep in the interactive LRU cache')
+    parser.add_argument('--compare-quantized', action='store_true',
+                        help='Report parity and latency of the quantized encoder against the float model')
+    parser.add_argument('--hybrid', action='store_true',
+                        help='Try exact and synonym dictionary lookups first, fusing fuzzy and semantic results on a miss')
+    parser.add_argument('--dictionary', type=str, default='yoruba_synonyms_expanded.json',
+                        help='Dictionary JSON file used by --hybrid')
     
     args = parser.parse_args()
     
+    if args.compare_quantized:
+        index = faiss.read_index(args.index)
+        headwords = load_metadata(args.headwords)
+        model_name = args.model or get_model_name()
+        compare_quantized(index, headwords, model_name)
+        return
+    
+    if args.query_file:
+        # Batch mode encodes and searches whole query matrices, which the per-query
+        # dictionary and field searches can't take part in
+        if args.hybrid or args.by_meaning:
+            parser.error("--hybrid and --by-meaning are not supported with --query-file")
+        
+        index, headwords, entries, model = load_resources(
+            args.index, args.headwords, args.entries, args.model, quantize=args.quantize
+        )
+        neighbours = load_neighbour_table(headwords)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                run_batch_queries(args.query_file, index, entries, model, args.top_k, args.batch_size, f,
+                                  neighbours)
+        else:
+            run_batch_queries(args.query_file, index, entries, model, args.top_k, args.batch_size,
+                              neighbours=neighbours)
+        return
+    
+    dictionary_file = args.dictionary if args.hybrid else None
+    
     # If a query was provided, run it and exit
     if args.query:
         index, headwords, entries, model = load_resources(
-            args.index, args.headwords, args.entries, args.model
+            args.index, args.headwords, args.entries, args.model, quantize=args.quantize
         )
-        results = search_synonyms(args.query, index, headwords, entries, model)
+        field_indexes = load_field_indexes() if args.by_meaning else None
+        search = make_searcher(index, headwords, entries, model, dictionary_file=dictionary_file,
+                               field_indexes=field_indexes, neighbours=load_neighbour_table(headwords))
+        results = search(args.query, top_k=args.top_k)
         display_results(results)
+        print(f"Total time including startup: {time.time() - start_time:.2f} seconds", file=sys.stderr)
     else:
         # Otherwise run in interactive mode
-        interactive_search(args.index, args.headwords, args.entries, args.model)
+        interactive_search(args.index, args.headwords, args.entries, args.model,
+                           quantize=args.quantize, cache_size=args.cache_size,
+                           dictionary_file=dictionary_file, by_meaning=args.by_meaning)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
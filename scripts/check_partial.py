@@ -5,22 +5,29 @@
 check_partial.py - Check the status of a partially generated dictionary
 """
 
-import json
 import sys
 import random
 import os
 
+from expand_massive_dictionary import iter_checkpoint
+
 def check_partial_dictionary(partial_file, num_samples=3):
     """Check and report on a partially generated dictionary"""
     try:
         file_size_mb = os.path.getsize(partial_file) / (1024 * 1024)
         print(f"Partial file size: {file_size_mb:.2f} MB")
         
-        with open(partial_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        # The checkpoint only holds generated entries, one JSON segment per batch
+        data = {}
+        batches = 0
+        for _, entries in iter_checkpoint(partial_file):
+            batches += 1
+            for entry in entries:
+                data[entry['headword']] = entry
+        print(f"Completed batches: {batches:,}")
             
         current_count = len(data)
-        print(f"Current entry count: {current_count:,}")
+        print(f"Generated entry count: {current_count:,}")
         
         if current_count > 0:
             # Show some random samples
@@ -66,7 +73,7 @@ def check_partial_dictionary(partial_file, num_samples=3):
     return 0
 
 if __name__ == "__main__":
-    partial_file = "yoruba_synonyms_massive.json.partial"
+    partial_file = "yoruba_synonyms_massive.json.partial.jsonl"
     num_samples = 3
     
     if len(sys.argv) > 1:
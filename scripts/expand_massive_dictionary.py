@@ -11,6 +11,9 @@ import itertools
 import os
 import sys
 import time
+import argparse
+import unicodedata
+import multiprocessing as mp
 from pathlib import Path
 from tqdm import tqdm
 
@@ -318,11 +321,117 @@ def generate_enhanced_entry():
         "example": example
     }
 
-def expand_massive_dictionary(input_file, output_file, target_count=100000, batch_size=1000):
+def load_synonym_candidates(file_path):
+    """Load get_common.py --candidates-output as a word -> candidate words mapping"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        candidates = json.load(f)
+    return {word: [neighbour["word"] for neighbour in neighbours] for word, neighbours in candidates.items()}
+
+def seed_synonyms(entry, candidates):
+    """Put corpus-derived synonym candidates ahead of the entry's own synonyms; True if any were added"""
+    # Candidate keys are lowercased NFC words, as counted by get_common.py
+    headword = entry["headword"]
+    words = candidates.get(unicodedata.normalize('NFC', headword.lower()), [])
+    seeded = [word for word in words if word != headword]
+    if seeded:
+        entry["synonyms"] = seeded + [word for word in entry["synonyms"] if word not in seeded]
+    return bool(seeded)
+
+# Headwords of the input dictionary, set in each worker so batches can skip them
+_known_headwords = set()
+
+def _init_worker(known_headwords):
+    """Give a worker process the input dictionary's headwords"""
+    global _known_headwords
+    _known_headwords = known_headwords
+
+def generate_batch(task):
+    """Generate one batch of entries with headwords unique within the batch"""
+    seed, batch_index, count = task
+    # Each batch has its own random stream, so its output depends only on the seed
+    # and its position, not on which worker runs it
+    random.seed(None if seed is None else f"{seed}:{batch_index}")
+    
+    entries = []
+    batch_headwords = set()
+    for _ in range(count):
+        # Keep trying until we get a unique headword
+        attempt_count = 0
+        while attempt_count < 50:  # Limit attempts to avoid infinite loops
+            attempt_count += 1
+            entry = generate_enhanced_entry()
+            headword = entry["headword"]
+            
+            if headword not in _known_headwords and headword not in batch_headwords:
+                break
+        else:
+            # If we couldn't find a unique headword after many attempts, add a random suffix
+            headword = headword + str(random.randint(1, 999))
+            entry["headword"] = headword
+        
+        batch_headwords.add(headword)
+        entries.append(entry)
+    
+    return entries
+
+def iter_checkpoint(checkpoint_file):
+    """Yield (batch index, entries) for each complete segment of a checkpoint file"""
+    with open(checkpoint_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            # A segment without its newline was cut off mid-write and is ignored
+            if not line.endswith('\n'):
+                break
+            segment = json.loads(line)
+            yield segment["batch"], segment["entries"]
+
+def truncate_checkpoint(checkpoint_file):
+    """Drop a partially written last segment so new segments can be appended after it"""
+    end = 0
+    with open(checkpoint_file, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            end += len(line)
+    with open(checkpoint_file, 'r+b') as f:
+        f.truncate(end)
+
+def write_dictionary(output_file, dictionary, checkpoint_file):
+    """Write the input dictionary followed by the checkpointed entries, one entry at a time"""
+    first = True
+    
+    def write_entry(f, headword, entry):
+        nonlocal first
+        # Same layout as json.dump(..., indent=2) of the whole dictionary
+        f.write('\n' if first else ',\n')
+        f.write('  ' + json.dumps(headword, ensure_ascii=False) + ': ')
+        f.write(json.dumps(entry, ensure_ascii=False, indent=2).replace('\n', '\n  '))
+        first = False
+    
+    tmp_file = output_file + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        f.write('{')
+        for headword, entry in dictionary.items():
+            write_entry(f, headword, entry)
+        if os.path.exists(checkpoint_file):
+            for _, entries in iter_checkpoint(checkpoint_file):
+                for entry in entries:
+                    write_entry(f, entry["headword"], entry)
+        f.write('\n}' if not first else '}')
+    os.replace(tmp_file, output_file)
+
+def expand_massive_dictionary(input_file, output_file, target_count=100000, batch_size=1000,
+                              workers=1, seed=None, candidates_file=None):
     """Expand the dictionary to a massive number of entries, saving in batches"""
     print(f"Loading existing dictionary from {input_file}...")
     dictionary = load_existing_dictionary(input_file)
     
+    candidates = {}
+    if candidates_file:
+        print(f"Loading synonym candidates from {candidates_file}...")
+        candidates = load_synonym_candidates(candidates_file)
+        seeded = sum(seed_synonyms(entry, candidates) for entry in dictionary.values())
+        print(f"Seeded synonyms of {seeded} existing entries from {len(candidates)} candidate lists.")
+    
     current_count = len(dictionary)
     print(f"Current dictionary has {current_count} entries.")
     
@@ -333,90 +442,131 @@ def expand_massive_dictionary(input_file, output_file, target_count=100000, batc
         print("Dictionary already contains the target number of entries.")
         return current_count
     
-    # Track new headwords to avoid duplicates
-    existing_headwords = set(dictionary.keys())
+    # Each checkpoint segment is one JSON line holding only the entries a batch added,
+    # so saving costs the size of the batch rather than of the whole dictionary
+    checkpoint_file = f"{output_file}.partial.jsonl"
+    known_headwords = set(dictionary.keys())
+    headwords = set(known_headwords)
+    next_batch = 0
+    if os.path.exists(checkpoint_file):
+        truncate_checkpoint(checkpoint_file)
+        for batch_index, entries in iter_checkpoint(checkpoint_file):
+            headwords.update(entry["headword"] for entry in entries)
+            next_batch = batch_index + 1
+        print(f"Resuming from {checkpoint_file}: {len(headwords) - current_count} entries "
+              f"from {next_batch} batches already generated.")
+    
+    pool = None
+    if workers > 1:
+        print(f"Starting {workers} worker processes...")
+        pool = mp.Pool(workers, initializer=_init_worker, initargs=(known_headwords,))
+    else:
+        _init_worker(known_headwords)
     
     # Set up progress bar
-    pbar = tqdm(total=entries_to_add, desc="Generating entries")
+    pbar = tqdm(total=entries_to_add, initial=min(len(headwords) - current_count, entries_to_add),
+                desc="Generating entries")
     
     # Track time
     start_time = time.time()
+    resumed_count = len(headwords)
+    duplicates = 0
     
-    # Generate in batches and save intermediate results
-    for batch_start in range(0, entries_to_add, batch_size):
-        batch_end = min(batch_start + batch_size, entries_to_add)
-        batch_size_actual = batch_end - batch_start
-        
-        for _ in range(batch_size_actual):
-            # Keep trying until we get a unique headword
-            attempt_count = 0
-            while attempt_count < 50:  # Limit attempts to avoid infinite loops
-                attempt_count += 1
-                entry = generate_enhanced_entry()
-                headword = entry["headword"]
+    try:
+        with open(checkpoint_file, 'a', encoding='utf-8') as checkpoint:
+            # Generate in batches and save intermediate results; later rounds make up
+            # for headwords that turned out to be duplicates across batches
+            while len(headwords) < target_count:
+                missing = target_count - len(headwords)
+                # Batches are always full size, so batch i is the same whether the run
+                # was resumed or not; the merge stops as soon as the target is reached
+                tasks = []
+                for _ in range(0, missing, batch_size):
+                    tasks.append((seed, next_batch, batch_size))
+                    next_batch += 1
                 
-                if headword not in existing_headwords:
-                    dictionary[headword] = entry
-                    existing_headwords.add(headword)
-                    pbar.update(1)
-                    break
-            
-            # If we couldn't find a unique headword after many attempts, add a random suffix
-            if attempt_count >= 50:
-                headword = headword + str(random.randint(1, 999))
-                entry["headword"] = headword
-                dictionary[headword] = entry
-                existing_headwords.add(headword)
-                pbar.update(1)
-        
-        # Calculate and display stats
-        elapsed_time = time.time() - start_time
-        entries_per_second = (batch_start + batch_size_actual) / elapsed_time if elapsed_time > 0 else 0
-        estimated_remaining = (entries_to_add - (batch_start + batch_size_actual)) / entries_per_second if entries_per_second > 0 else 0
-        
-        print(f"\nBatch {batch_start+1}-{batch_end} complete. " + 
-              f"Speed: {entries_per_second:.2f} entries/sec. " + 
-              f"Est. remaining time: {estimated_remaining/60:.1f} minutes.")
-        
-        # Save intermediate results
-        intermediate_file = f"{output_file}.partial"
-        print(f"Saving intermediate dictionary with {len(dictionary)} entries...")
-        with open(intermediate_file, 'w', encoding='utf-8') as f:
-            json.dump(dictionary, f, ensure_ascii=False, indent=None)  # Use compact JSON to save space
+                # imap keeps batch order, so the merge is the same for any number of workers
+                results = pool.imap(generate_batch, tasks) if pool else map(generate_batch, tasks)
+                for (_, batch_index, _), entries in zip(tasks, results):
+                    added_entries = []
+                    for entry in entries:
+                        if len(headwords) >= target_count:
+                            break
+                        if entry["headword"] in headwords:
+                            duplicates += 1
+                            continue
+                        headwords.add(entry["headword"])
+                        seed_synonyms(entry, candidates)
+                        added_entries.append(entry)
+                    pbar.update(len(added_entries))
+                    
+                    # Save intermediate results
+                    checkpoint.write(json.dumps({"batch": batch_index, "entries": added_entries},
+                                                ensure_ascii=False) + '\n')
+                    checkpoint.flush()
+                    os.fsync(checkpoint.fileno())
+                    
+                    # Calculate and display stats
+                    added = len(headwords) - current_count
+                    elapsed_time = time.time() - start_time
+                    entries_per_second = (len(headwords) - resumed_count) / elapsed_time if elapsed_time > 0 else 0
+                    estimated_remaining = (entries_to_add - added) / entries_per_second if entries_per_second > 0 else 0
+                    
+                    print(f"\nBatch complete, {added}/{entries_to_add} entries added. " + 
+                          f"Speed: {entries_per_second:.2f} entries/sec. " + 
+                          f"Est. remaining time: {estimated_remaining/60:.1f} minutes.")
+                    
+                    if len(headwords) >= target_count:
+                        break
+    finally:
+        if pool:
+            pool.terminate()
+            pool.join()
     
     pbar.close()
+    if duplicates:
+        print(f"Dropped {duplicates} headwords generated by more than one batch")
     
     # Final save with pretty formatting
-    print(f"Writing final dictionary with {len(dictionary)} entries to {output_file}...")
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(dictionary, f, ensure_ascii=False, indent=2)
+    print(f"Writing final dictionary with {len(headwords)} entries to {output_file}...")
+    write_dictionary(output_file, dictionary, checkpoint_file)
     
     # Clean up intermediate file
-    if os.path.exists(intermediate_file):
-        os.remove(intermediate_file)
+    if os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
     
     # Report stats
     total_time = time.time() - start_time
     print(f"\nDictionary expansion complete!")
     print(f"Total time: {total_time/60:.2f} minutes")
-    print(f"Average speed: {entries_to_add/total_time:.2f} entries/second")
-    print(f"Final dictionary contains {len(dictionary)} entries.")
+    print(f"Average speed: {(len(headwords) - resumed_count)/total_time:.2f} entries/second")
+    print(f"Final dictionary contains {len(headwords)} entries.")
     
-    return len(dictionary)
+    return len(headwords)
 
 if __name__ == "__main__":
-    input_file = "yoruba_synonyms_expanded.json"
-    output_file = "yoruba_synonyms_massive.json"
-    target_count = 100000
-    batch_size = 1000
-    
-    # Parse command line arguments if provided
-    if len(sys.argv) > 1:
-        try:
-            target_count = int(sys.argv[1])
-        except ValueError:
-            print(f"Invalid target count: {sys.argv[1]}")
-            print(f"Using default: {target_count}")
+    parser = argparse.ArgumentParser(description='Generate a massive Yoruba dictionary')
+    parser.add_argument('target_count', type=int, nargs='?', default=100000,
+                        help='Number of entries in the final dictionary')
+    parser.add_argument('--input', type=str, default='yoruba_synonyms_expanded.json',
+                        help='Dictionary to start from')
+    parser.add_argument('--output', type=str, default='yoruba_synonyms_massive.json',
+                        help='Output dictionary file')
+    parser.add_argument('--batch-size', type=int, default=1000,
+                        help='Entries generated per batch and saved per checkpoint (keep it the same when resuming)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of generation processes')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='Seed for reproducible output (the same seed gives the same dictionary)')
+    parser.add_argument('--candidates', type=str, default=None,
+                        help='Synonym candidates JSON from get_common.py --candidates-output; '
+                             'listed first in the synonyms of matching headwords')
+    
+    args = parser.parse_args()
+    input_file = args.input
+    output_file = args.output
+    target_count = args.target_count
+    batch_size = args.batch_size
     
     # Show warning for very large dictionaries
     if target_count > 100000:
@@ -438,8 +588,10 @@ if __name__ == "__main__":
     print(f"Batch size: {batch_size}\n")
     
     try:
-        final_count = expand_massive_dictionary(input_file, output_file, target_count, batch_size)
+        final_count = expand_massive_dictionary(input_file, output_file, target_count, batch_size,
+                                                args.workers, args.seed, args.candidates)
         print(f"Final dictionary contains {final_count} entries.")
     except KeyboardInterrupt:
-        print("\nProcess interrupted by user. Partial results may have been saved.")
+        print(f"\nProcess interrupted by user. Completed batches are saved in {output_file}.partial.jsonl; "
+              "run the same command again to resume.")
         sys.exit(1) 
\ No newline at end of file
@@ -8,13 +8,34 @@ simple_app.py - Streamlit web app for the Yoruba synonym finder using a massive
 import streamlit as st
 import json
 import difflib
+import math
 import os
+import random
 import time
+from frequency_table import load_frequency_table
+from hybrid_search import normalize_word, sample_keys
+
+# How much corpus frequency can lift a fuzzy match: the most common word gains this much similarity
+FREQUENCY_BOOST = 0.1
 
 # --- Dictionary Loading and Search Functions ---
 
+def file_signature(paths):
+    """
+    Path, size and modification time of each existing file. Passed to the cached
+    loaders below so they reload when a file is regenerated or replaced.
+    """
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        signature.append((path, stat.st_size, stat.st_mtime_ns))
+    return tuple(signature)
+
 @st.cache_data(ttl=3600)  # Cache the dictionary for 1 hour
-def load_dictionary(dict_files):
+def load_dictionary(dict_files, signature=()):
     """
     Load the Yoruba synonyms dictionary from a JSON file.
     Tries each file in the provided list until one succeeds.
@@ -37,15 +58,38 @@ def load_dictionary(dict_files):
     st.error("Failed to load any dictionary files.")
     return {}
 
-def normalize_word(word):
+@st.cache_resource
+def load_frequencies(frequency_files, signature=()):
     """
-    Normalize a Yoruba word for matching: lowercase and strip whitespace.
+    Memory-map the corpus frequency table written by get_common.py, if there is one.
     """
-    return word.lower().strip()
+    return load_frequency_table(frequency_files)
 
-def search_synonyms(query, dictionary, max_results=3):
+@st.cache_resource
+def rank_headwords(_dictionary, _frequencies, dictionary_signature, frequency_signature):
+    """
+    Headwords sorted from most to least common in the corpus, computed once per
+    version of the dictionary and frequency files.
+    """
+    return sorted(_dictionary.keys(), key=lambda headword: -_frequencies.get(headword))
+
+def rank_by_frequency(query, matches, frequencies):
+    """
+    Order fuzzy matches by spelling similarity, nudged up by how common each word is.
+    """
+    scale = math.log1p(frequencies.max_count) or 1.0
+    
+    def score(match):
+        similarity = difflib.SequenceMatcher(None, query, match).ratio()
+        return similarity + FREQUENCY_BOOST * math.log1p(frequencies.get(match)) / scale
+    
+    return sorted(matches, key=score, reverse=True)
+
+def search_synonyms(query, dictionary, max_results=3, frequencies=None, ranked_headwords=None):
     """
     Search for synonyms of the given query word using the dictionary.
+    With a corpus frequency table, synonym and fuzzy matches are ranked with
+    the most common words first.
     """
     start_time = time.time()
     query = normalize_word(query)
@@ -58,40 +102,47 @@ def search_synonyms(query, dictionary, max_results=3):
     # Fuzzy match - find closest matches for unknown words
     results = []
     
+    # Most common headwords first when frequencies are known, so the scans below favour them
+    headwords = ranked_headwords if frequencies is not None and ranked_headwords is not None else list(dictionary.keys())
+    
     # Check if query is in any of the synonyms (up to a limit to maintain performance)
     synonym_check_limit = 1000
     synonym_checks = 0
     
-    for headword, entry in dictionary.items():
+    for headword in headwords:
         if synonym_checks >= synonym_check_limit:
             break
             
         synonym_checks += 1
+        entry = dictionary[headword]
         for synonym in entry["synonyms"]:
             if normalize_word(synonym) == query:
                 search_time = time.time() - start_time
                 results.append({
-                    "rank": 1,
+                    "rank": len(results) + 1,
                     "similarity": 1.0,
                     "entry": entry,
                     "search_time": search_time
                 })
-                return results  # Found exact match in synonyms
-    
-    # Use difflib to find fuzzy matches - only check a subset of keys for very large dictionaries
-    dict_keys = list(dictionary.keys())
-    
-    # Sampling keys for large dictionaries to improve performance
-    if len(dict_keys) > 10000:
-        # Take a sample of common words + random words
-        # For large dictionaries, we'll check the first 500 entries (likely common words)
-        # plus a random sampling of 2500 more entries
-        import random
-        sampled_keys = dict_keys[:500] + random.sample(dict_keys[500:], min(2500, len(dict_keys) - 500))
-    else:
-        sampled_keys = dict_keys
+                break
+        
+        # Without frequencies any match will do; with them, stop once enough of the most common are found
+        if results and (frequencies is None or len(results) >= max_results):
+            return results
+    
+    if results:
+        return results
     
-    matches = difflib.get_close_matches(query, sampled_keys, n=max_results, cutoff=0.6)
+    # Use difflib to find fuzzy matches - only check a subset of keys for very large dictionaries.
+    # The sample starts with the first 500 headwords, the most common words when frequencies are known
+    sampled_keys = sample_keys(headwords)
+    
+    if frequencies is not None:
+        # Take extra candidates so common words just outside the top few can move up
+        matches = difflib.get_close_matches(query, sampled_keys, n=max_results * 3, cutoff=0.6)
+        matches = rank_by_frequency(query, matches, frequencies)[:max_results]
+    else:
+        matches = difflib.get_close_matches(query, sampled_keys, n=max_results, cutoff=0.6)
     
     for i, match in enumerate(matches):
         # Calculate a similarity score (1.0 to 0.0)
@@ -299,12 +350,21 @@ def main():
     ]
     
     # Load the dictionary
-    dictionary = load_dictionary(dictionary_files)
+    dictionary_signature = file_signature(dictionary_files)
+    dictionary = load_dictionary(dictionary_files, dictionary_signature)
     
     if not dictionary:
         st.error("Could not load any dictionary file. Please generate a dictionary first.")
         return
     
+    # Corpus frequencies from get_common.py rank matches and suggestions when available
+    frequency_files = ['yoruba_frequencies.bin']
+    frequency_signature = file_signature(frequency_files)
+    frequencies = load_frequencies(frequency_files, frequency_signature)
+    ranked_headwords = None
+    if frequencies:
+        ranked_headwords = rank_headwords(dictionary, frequencies, dictionary_signature, frequency_signature)
+    
     # Display dictionary stats
     st.markdown(f"""
     <div class="stats-container">
@@ -331,7 +391,6 @@ def main():
         st.info(f"Using dictionary with {len(dictionary):,} entries.")
         
         # Show some random sample words
-        import random
         st.write("Sample of available words:")
         
         num_cols = 3
@@ -351,7 +410,8 @@ def main():
     # Process search when button is clicked
     if search_button and query:
         with st.spinner("Searching..."):
-            results = search_synonyms(query, dictionary, max_results=max_results)
+            results = search_synonyms(query, dictionary, max_results=max_results,
+                                      frequencies=frequencies, ranked_headwords=ranked_headwords)
             
             if not results:
                 st.warning(f"No synonyms found for '{query}'.")
@@ -359,8 +419,9 @@ def main():
                 # Suggest some available words
                 st.write("Try one of these words instead:")
                 
-                # Get some random suggestions from dictionary
-                suggestions = random.sample(list(dictionary.keys()), min(10, len(dictionary)))
+                # Get some random suggestions from dictionary, drawn from the most common words if known
+                suggestion_pool = ranked_headwords[:100] if ranked_headwords else list(dictionary.keys())
+                suggestions = random.sample(suggestion_pool, min(10, len(suggestion_pool)))
                 
                 # Display in two columns
                 suggestion_cols = st.columns(2)
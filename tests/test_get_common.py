@@ -0,0 +1,23 @@
+from collections import Counter
+
+from get_common import MisraGries, summary_capacity
+
+def test_misra_gries_keeps_top_n_when_counts_tie_at_the_cutoff():
+    # d, e and f tie for 4th place; 30 singletons force a prune
+    counts = {"a": 10, "b": 9, "c": 8, "d": 7, "e": 7, "f": 7}
+    tokens = [word for word, count in counts.items() for _ in range(count)]
+    tokens += [f"w{i}" for i in range(30)]
+    
+    summary = MisraGries(summary_capacity(5, 5))
+    summary.update(tokens)
+    top = summary.most_common(5)
+    
+    exact = Counter(tokens)
+    assert len(top) == 5
+    assert {"a", "b", "c"} <= {word for word, _ in top}
+    assert all(exact[word] >= 7 for word, _ in top)
+    assert all(exact[word] - summary.error_bound <= estimate <= exact[word] for word, estimate in top)
+
+def test_summary_capacity_has_headroom_over_top_n():
+    assert summary_capacity(5, 5) == 10
+    assert summary_capacity(1000, 200) == 1000